@@ -0,0 +1,173 @@
+
+#encoding: utf-8
+
+#Sizes a CSV of operating points chunk by chunk and streams the results to another CSV.
+#Usage: python app/batch_sizing.py operating_points.csv results.csv [--chunk-size 50000] [--workers 8]
+
+import argparse
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from core.constants import INPUT_UNITS, OUTPUT_COLUMNS, FLAG_COLUMNS
+from core.catalog import load_valves, load_fluids
+from core.sizing import DimensionamientoBatch, get_fluid_properties
+from core.units import get_scale_and_offset
+from core.interpolation import get_dense_lookup_points
+from core.shared_catalog import SharedCatalog, attach_shared_catalog
+
+DEFAULT_CHUNK_SIZE = 50000
+
+DIFFERENTIAL_COLUMNS = ['pressure_differential'] #Differences of two values: converted with the scale only, an offset would cancel out
+INPUT_COLUMNS = ['tag', 'valve', 'diameter', 'flow', 'in_pressure', 'pressure_differential', 'out_pressure', 'temperature', 'fluid',
+                 'specific_gravity', 'vapor_pressure', 'viscosity'] #pressure_differential or out_pressure; fluid properties only needed for 'Otro'
+
+
+def read_operating_points(path, chunk_size):
+    return(pd.read_csv(path,
+                       chunksize = chunk_size,
+                       dtype = {'tag': str, 'valve': str, 'fluid': str},
+                       skipinitialspace = True))
+
+def to_base_units(chunk: pd.DataFrame, units: dict):
+    for column, unit in units.items():
+        if column not in chunk.columns or unit == INPUT_UNITS[column]:
+            continue
+        scale, offset = get_scale_and_offset(unit, INPUT_UNITS[column]) #pint only runs once per unit, not per chunk
+        if column in DIFFERENTIAL_COLUMNS:
+            offset = 0.0
+        chunk[column] = chunk[column].to_numpy(dtype = float) * scale + offset
+
+def fill_missing_columns(chunk: pd.DataFrame): #After to_base_units, so a derived differential comes from converted pressures
+    for column in INPUT_COLUMNS:
+        if column not in chunk.columns:
+            chunk[column] = np.nan
+    missing_differential = chunk['pressure_differential'].isna()
+    chunk.loc[missing_differential, 'pressure_differential'] = chunk['in_pressure'] - chunk['out_pressure']
+    chunk.loc[chunk['out_pressure'].isna(), 'out_pressure'] = chunk['in_pressure'] - chunk['pressure_differential']
+
+def fill_fluid_properties(chunk: pd.DataFrame, fluids: dict):
+    errors = pd.Series('', index = chunk.index)
+    for fluid_name, rows in chunk.groupby('fluid', sort = False).groups.items():
+        if fluid_name not in fluids:
+            errors.loc[rows] = f'unknown fluid {fluid_name}'
+            continue
+        properties = get_fluid_properties(fluids[fluid_name], chunk.loc[rows, 'temperature'].to_numpy(dtype = float))
+        for attribute_name in ['specific_gravity', 'vapor_pressure', 'viscosity']:
+            given = chunk.loc[rows, attribute_name].to_numpy(dtype = float)
+            chunk.loc[rows, attribute_name] = np.where(np.isnan(given), properties[attribute_name], given) #Explicit values win
+    specific_gravity = chunk['specific_gravity'].to_numpy(dtype = float)
+    errors[(errors == '') & np.isnan(specific_gravity)] = 'missing specific_gravity, or fluid and temperature' #Like the service
+    errors[(errors == '') & (specific_gravity <= 0)] = 'specific_gravity must be positive'
+    return(errors)
+
+def size_chunk(chunk: pd.DataFrame, valves: dict, fluids: dict, units: dict):
+    chunk = chunk.copy()
+    to_base_units(chunk, units)
+    fill_missing_columns(chunk)
+    errors = fill_fluid_properties(chunk, fluids)
+
+    results = pd.DataFrame(np.nan, index = chunk.index, columns = OUTPUT_COLUMNS)
+    flags = pd.DataFrame(False, index = chunk.index, columns = FLAG_COLUMNS)
+
+    for (valve_name, diameter), rows in chunk.groupby(['valve', 'diameter'], sort = False).groups.items():
+        valve = valves.get(valve_name)
+        if valve is None:
+            errors.loc[rows] = f'unknown valve {valve_name}'
+            continue
+        if diameter not in valve.diameter_rows:
+            errors.loc[rows] = f'no Cv data for {valve_name} {diameter:g} in'
+            continue
+
+        rows = rows[errors.loc[rows].to_numpy() == ''] #Unknown fluid or no specific gravity: left unsized, outputs NaN and flags False
+        if len(rows) == 0:
+            continue
+
+        points = chunk.loc[rows]
+        dimens = DimensionamientoBatch(valve,
+                                       float(diameter),
+                                       points['flow'].to_numpy(dtype = float),
+                                       points['in_pressure'].to_numpy(dtype = float),
+                                       points['pressure_differential'].to_numpy(dtype = float),
+                                       points['specific_gravity'].to_numpy(dtype = float),
+                                       points['vapor_pressure'].to_numpy(dtype = float),
+                                       points['viscosity'].to_numpy(dtype = float))
+        dimens.calculate_outputs()
+        dimens.set_flags()
+
+        for column in OUTPUT_COLUMNS:
+            results.loc[rows, column] = getattr(dimens, column)
+        for column in FLAG_COLUMNS:
+            flags.loc[rows, column] = getattr(dimens, column)
+
+    errors[chunk['valve'].isna() | chunk['diameter'].isna()] = 'missing valve or diameter'
+    sized = pd.concat([chunk[INPUT_COLUMNS], results, flags], axis = 1)
+    warnings = pd.Series('', index = chunk.index)
+    for column in FLAG_COLUMNS:
+        warnings = warnings + np.where(flags[column], f'{column} ', '')
+    sized['warnings'] = warnings.str.rstrip()
+    sized['error'] = errors
+    return(sized)
+
+def size_chunk_in_worker(chunk: pd.DataFrame, units: dict): #Runs in a pool process, its catalog is the shared one
+    return(size_chunk(chunk, load_valves(), load_fluids(), units))
+
+def size_chunks_in_parallel(chunks, units: dict, workers): #Sized chunks in input order, at most two per worker in flight
+    with SharedCatalog.create() as catalog, ProcessPoolExecutor(max_workers = workers,
+                                                                  initializer = attach_shared_catalog,
+                                                                  initargs = (catalog.handle, get_dense_lookup_points())) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(size_chunk_in_worker, chunk, units))
+            if len(pending) >= 2 * workers:
+                yield(pending.popleft().result())
+        while pending:
+            yield(pending.popleft().result())
+
+def size_csv(input_path, output_path, chunk_size = DEFAULT_CHUNK_SIZE, units: dict | None = None, workers = 1):
+    units = units or {}
+    chunks = read_operating_points(input_path, chunk_size)
+    if workers > 1:
+        sized_chunks = size_chunks_in_parallel(chunks, units, workers)
+    else:
+        valves = load_valves()
+        fluids = load_fluids()
+        sized_chunks = (size_chunk(chunk, valves, fluids, units) for chunk in chunks)
+
+    rows = 0
+    header = True
+    for sized in sized_chunks:
+        sized.to_csv(output_path, mode = 'w' if header else 'a', header = header, index = False)
+        header = False
+        rows += len(sized)
+    return(rows)
+
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(description = 'Sizes every operating point of a CSV file and writes results plus warning flags to another CSV. '
+                                                   f'Input columns: {", ".join(INPUT_COLUMNS)}. Diameter in inches.')
+    parser.add_argument('input', help = 'CSV of operating points')
+    parser.add_argument('output', help = 'CSV to write, overwritten if it exists')
+    parser.add_argument('--chunk-size', type = int, default = DEFAULT_CHUNK_SIZE, help = 'rows sized per chunk')
+    parser.add_argument('--flow-unit', default = INPUT_UNITS['flow'], help = 'unit of the flow column, e.g. m³/h')
+    parser.add_argument('--pressure-unit', default = INPUT_UNITS['in_pressure'], help = 'unit of the pressure columns, e.g. bar')
+    parser.add_argument('--temperature-unit', default = INPUT_UNITS['temperature'], help = 'unit of the temperature column, e.g. °F')
+    parser.add_argument('--workers', type = int, default = 1, help = f'processes sizing chunks in parallel, e.g. {os.cpu_count()} on this machine; results keep the input order')
+    return(parser.parse_args(arguments))
+
+def main(arguments = None):
+    arguments = parse_arguments(arguments)
+    units = {'flow': arguments.flow_unit,
+             'in_pressure': arguments.pressure_unit,
+             'pressure_differential': arguments.pressure_unit,
+             'out_pressure': arguments.pressure_unit,
+             'vapor_pressure': arguments.pressure_unit,
+             'temperature': arguments.temperature_unit}
+    rows = size_csv(arguments.input, arguments.output, arguments.chunk_size, units, arguments.workers)
+    print(f'{rows} operating points sized into {arguments.output}', file = sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
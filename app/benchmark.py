@@ -0,0 +1,203 @@
+
+#encoding: utf-8
+
+#Times the sizing pipeline and a headless render of the page, and writes the results as JSON.
+#Usage: python app/benchmark.py --output benchmark.json [--compare previous.json] [--quick]
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+APP_PATH = Path(__file__).resolve().parent
+BENCHMARK_FORMAT_VERSION = 1
+
+PA_100 = {'valve_name': 'PA', 'diameter': 4.0} #PA DN100, the case used for the AppTest render
+OPERATING_POINT = {'flow': 2201.4, 'in_pressure': 50.0, 'pressure_differential': 10.0, 'specific_gravity': 0.99919, 'vapor_pressure': 0.34, 'viscosity': 1.0} #Base units
+
+
+def time_call(function, number = 1, repeat = 5): #Seconds per call of each repetition
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return({'number': number,
+            'repeat': repeat,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.fmean(timings),
+            'max': max(timings)})
+
+def clear_catalog_caches(): #Back to the state right after import, the next load reads the compiled catalog again
+    from core import catalog, selection
+
+    for function in [catalog.load_catalog_arrays, catalog.get_catalog_version, catalog.load_Reynolds_correction_interpolator,
+                     catalog.load_fluids, catalog.load_valves, selection.get_max_Cv_index]:
+        function.cache_clear()
+
+
+def benchmark_process_cold_start(repeat): #New interpreter: imports plus first load, what a fresh server replica pays
+    code = 'from core.catalog import load_valves, load_fluids; load_fluids(); load_valves()["PA"]'
+    environment = dict(os.environ, PYTHONPATH = str(APP_PATH))
+    def run():
+        subprocess.run([sys.executable, '-c', code], check = True, env = environment, cwd = APP_PATH)
+    return(time_call(run, repeat = repeat))
+
+def benchmark_catalog(repeat):
+    from core.catalog import load_valves, load_fluids
+
+    results = {}
+    def load_cold():
+        clear_catalog_caches()
+        load_fluids()
+        load_valves()[PA_100['valve_name']] #First series access reads its Cv/FL tables
+    results['load_catalog_cold'] = time_call(load_cold, repeat = repeat)
+
+    def load_warm():
+        load_fluids()
+        load_valves()[PA_100['valve_name']]
+    results['load_catalog_warm'] = time_call(load_warm, number = 10000, repeat = repeat)
+    return(results)
+
+def benchmark_units(repeat):
+    from core.units import to_base_unit, from_base_unit
+
+    to_base_unit(1.0, 'Caudal', 'm³/h') #Builds the conversion table, paid once per process
+    results = {}
+    results['in_base_unit'] = time_call(lambda: to_base_unit(500.0, 'Caudal', 'm³/h'), number = 100000, repeat = repeat) #What backend.in_base_unit does besides reading session_state
+    results['in_base_unit_offset'] = time_call(lambda: to_base_unit(68.0, 'Temperatura', '°F'), number = 100000, repeat = repeat)
+    results['from_base_unit'] = time_call(lambda: from_base_unit(2201.4, 'Caudal', 'm³/h'), number = 100000, repeat = repeat)
+    return(results)
+
+def benchmark_sizing(repeat, loop_sizes):
+    import numpy as np
+    from core.catalog import load_valves
+    from core.sizing import Dimensionamiento, DimensionamientoBatch
+
+    valve = load_valves()[PA_100['valve_name']]
+    diameter = PA_100['diameter']
+    point = OPERATING_POINT
+
+    def new_dimensionamiento(flow = point['flow']):
+        return(Dimensionamiento(valve, None, flow, point['in_pressure'], point['pressure_differential'], diameter,
+                                point['specific_gravity'], point['vapor_pressure'], point['viscosity']))
+
+    results = {}
+    dimens = new_dimensionamiento()
+    results['calculate_outputs'] = time_call(dimens.calculate_outputs, number = 10000, repeat = repeat)
+
+    flows = np.linspace(100, 4000, max(loop_sizes)).tolist() #Different points, so nothing can be reused between them
+    for size in loop_sizes:
+        def sizing_loop():
+            for flow in flows[:size]:
+                dimens = new_dimensionamiento(flow)
+                dimens.calculate_outputs()
+                dimens.set_flags()
+        results[f'sizing_loop_{size}'] = time_call(sizing_loop, repeat = repeat)
+
+        def sizing_batch():
+            dimens = DimensionamientoBatch(valve, diameter, flows[:size], point['in_pressure'], point['pressure_differential'],
+                                           point['specific_gravity'], point['vapor_pressure'], point['viscosity'])
+            dimens.calculate_outputs()
+            dimens.set_flags()
+        results[f'sizing_batch_{size}'] = time_call(sizing_batch, repeat = repeat)
+
+    return(results)
+
+def benchmark_page(repeat): #Full headless runs of frontend.py, empty and with one column filled in
+    from streamlit.testing.v1 import AppTest
+
+    def render_empty():
+        app = AppTest.from_file(str(APP_PATH / 'frontend.py'), default_timeout = 60).run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        return(app)
+
+    app = render_empty()
+    app.selectbox(key = 'Válvula').select(PA_100['valve_name']).run()
+    app.selectbox(key = 'Diámetro').set_value(int(PA_100['diameter'] * 25)).run()
+    app.selectbox(key = 'Fluido').select('Agua').run()
+    app.number_input(key = 'Temperatura 0').set_value(20.0).run()
+    app.number_input(key = 'Caudal 0').set_value(500.0).run()
+    app.number_input(key = 'Presión de entrada 0').set_value(50.0).run()
+    app.number_input(key = 'Diferencia de presión 0').set_value(10.0).run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+    results = {}
+    results['render_page_empty'] = time_call(render_empty, repeat = repeat)
+    results['render_page_filled'] = time_call(app.run, repeat = repeat) #Rerun with every output, the plot and the warnings drawn
+    return(results)
+
+
+def get_environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, cwd = APP_PATH, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import numpy as np
+
+    return({'commit': commit,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')})
+
+def run_benchmarks(quick = False, repeat = 5):
+    loop_sizes = [1000] if quick else [1000, 100000]
+    results = {}
+    results['process_cold_start'] = benchmark_process_cold_start(repeat = min(repeat, 3))
+    results.update(benchmark_catalog(repeat))
+    results.update(benchmark_units(repeat))
+    results.update(benchmark_sizing(repeat, loop_sizes))
+    if not quick:
+        try:
+            results.update(benchmark_page(repeat = min(repeat, 3)))
+        except ImportError: #streamlit.testing missing, the rest is still comparable
+            print('streamlit.testing not available, page render skipped', file = sys.stderr)
+    return({'format_version': BENCHMARK_FORMAT_VERSION, 'environment': get_environment(), 'unit': 'seconds per call', 'results': results})
+
+def compare(report, previous): #Median ratio per benchmark, above 1 means slower than before
+    lines = []
+    for name, timing in report['results'].items():
+        if name not in previous['results']:
+            continue
+        ratio = timing['median'] / previous['results'][name]['median']
+        lines.append(f'{name:<28}{previous["results"][name]["median"]:>14.3e}{timing["median"]:>14.3e}{ratio:>9.2f}x')
+    return('\n'.join([f'{"benchmark":<28}{"before":>14}{"after":>14}{"ratio":>10}'] + lines))
+
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(description = 'Benchmarks catalog loading, unit conversion, sizing and the page render, and writes the timings as JSON.')
+    parser.add_argument('--output', help = 'JSON file to write, printed to stdout if omitted')
+    parser.add_argument('--compare', help = 'previous JSON report, prints the median ratio of every benchmark')
+    parser.add_argument('--repeat', type = int, default = 5, help = 'repetitions per benchmark, the median is compared')
+    parser.add_argument('--quick', action = 'store_true', help = 'skip the 100k loop and the page render')
+    return(parser.parse_args(arguments))
+
+def main(arguments = None):
+    arguments = parse_arguments(arguments)
+    report = run_benchmarks(quick = arguments.quick, repeat = arguments.repeat)
+
+    report_json = json.dumps(report, indent = 2)
+    if arguments.output:
+        Path(arguments.output).write_text(report_json + '\n', encoding = 'utf-8')
+    else:
+        print(report_json)
+
+    if arguments.compare:
+        previous = json.loads(Path(arguments.compare).read_text(encoding = 'utf-8'))
+        print(compare(report, previous), file = sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,23 +2,22 @@
 #encoding: utf-8
 
 import streamlit as st
-import pint
-import numpy as np
 import backend
-from unit_registry import ureg
-from constants import QUANTITY_NAME_TO_ATTRIBUTE_NAME, BASE_UNITS
+from core.units import from_base_unit
+from constants import QUANTITY_NAME_TO_ATTRIBUTE_NAME
 from load_data import Fluid, FLUIDS
+from session_values import get_session_values
 
 
 
 
-def update_number_inputs(unit_key, associated_keys):
+def update_number_inputs(quantity_name, unit_key, associated_keys):
+    session_values = get_session_values()
     for key in associated_keys:
-        if st.session_state['old_values'][key] is not None:
-            old_quantity = st.session_state['old_values'][key]
-            current_unit = ureg(st.session_state[unit_key])
-            current_quantity = old_quantity.to(current_unit)
-            st.session_state[key] = current_quantity.magnitude
+        old_value_in_base_unit = session_values.get(key)
+        if old_value_in_base_unit is not None:
+            current_unit = st.session_state[unit_key]
+            st.session_state[key] = from_base_unit(old_value_in_base_unit, quantity_name, current_unit)
 
 
 def update_pressure_differential_value(index):
@@ -37,10 +36,10 @@ def update_pressure_differential_value(index):
     
     else:
         pressure_differential_unit = st.session_state[pressure_differential_unit_key]
-        in_pressure_in_pdiff_unit = in_pressure_base.to(pressure_differential_unit)
-        out_pressure_in_pdiff_unit = out_pressure_base.to(pressure_differential_unit)
+        in_pressure_in_pdiff_unit = from_base_unit(in_pressure_base, 'Presión', pressure_differential_unit)
+        out_pressure_in_pdiff_unit = from_base_unit(out_pressure_base, 'Presión', pressure_differential_unit)
         pressure_differential = in_pressure_in_pdiff_unit - out_pressure_in_pdiff_unit
-        st.session_state[pressure_differential_key] = pressure_differential.magnitude
+        st.session_state[pressure_differential_key] = pressure_differential
 
 def enable_or_disable_pressure_differential_box(index):
     out_pressure_key = f'Presión de salida {index}'
@@ -51,7 +50,7 @@ def enable_or_disable_pressure_differential_box(index):
     else:
         disabled = True
 
-    st.session_state[f'{pressure_differential_key} is disabled'] = disabled
+    get_session_values().set_disabled(pressure_differential_key, disabled)
 
 def set_pressure_differential_box(index):
     update_pressure_differential_value(index)
@@ -74,10 +73,10 @@ def update_out_pressure_value(index):
     
     else:
         out_pressure_unit = st.session_state[out_pressure_unit_key]
-        in_pressure_in_out_pressure_unit = in_pressure_base.to(out_pressure_unit)
-        pdiff_in_out_pressure_unit = pressure_differential_base.to(out_pressure_unit)
+        in_pressure_in_out_pressure_unit = from_base_unit(in_pressure_base, 'Presión', out_pressure_unit)
+        pdiff_in_out_pressure_unit = from_base_unit(pressure_differential_base, 'Presión', out_pressure_unit)
         out_pressure = in_pressure_in_out_pressure_unit - pdiff_in_out_pressure_unit
-        st.session_state[out_pressure_key] = out_pressure.magnitude
+        st.session_state[out_pressure_key] = out_pressure
 
 def enable_or_disable_out_pressure_box(index):
     out_pressure_key = f'Presión de salida {index}'
@@ -88,7 +87,7 @@ def enable_or_disable_out_pressure_box(index):
     else:
         disabled = True
 
-    st.session_state[f'{out_pressure_key} is disabled'] = disabled
+    get_session_values().set_disabled(out_pressure_key, disabled)
 
 def set_out_pressure_box(index):
     update_out_pressure_value(index)
@@ -99,20 +98,21 @@ def update_pressure_differential_and_out_pressure_value(index):
     out_pressure_key = f'Presión de salida {index}'
     pressure_differential_key = f'Diferencia de presión {index}'
 
-    if st.session_state.get(f'{pressure_differential_key} is disabled', False):
+    session_values = get_session_values()
+    if session_values.is_disabled(pressure_differential_key):
         update_pressure_differential_value(index)
 
-    if st.session_state.get(f'{out_pressure_key} is disabled', False):
+    if session_values.is_disabled(out_pressure_key):
         update_out_pressure_value(index)
 
 def update_diameter_dropdown_value():
-    if st.session_state['old_values']['Diámetro'] is None:
+    diameter = get_session_values().get('Diámetro') #Inches
+    if diameter is None:
         return()
-    old_value = st.session_state['old_values']['Diámetro']
     if st.session_state['Diámetro unidad'] == 'mm': #De inch a mm
-        new_value = old_value * 25
-    if st.session_state['Diámetro unidad'] == 'in': #De mm a inch
-        new_value = int(old_value / 25)
+        new_value = int(diameter * 25)
+    if st.session_state['Diámetro unidad'] == 'in':
+        new_value = int(diameter)
     st.session_state['Diámetro'] = new_value
 
 def fill_fluid_values(fluid: Fluid, index):
@@ -130,24 +130,14 @@ def fill_fluid_values(fluid: Fluid, index):
             st.session_state[key] = None
         return()
 
-    temperature = temperature.magnitude
-
     for quantity_name in ['Gravedad específica', 'Presión de vapor', 'Viscosidad', 'Velocidad del sonido']:
         quantity_key = f'{quantity_name} 0'
         quantity_current_unit_key = f'{quantity_name} unidad'
-        quantity_current_unit = ureg(st.session_state[quantity_current_unit_key])
-        quantity_base_unit = ureg(BASE_UNITS[quantity_name])
+        quantity_current_unit = st.session_state[quantity_current_unit_key]
         
         attribute_name = QUANTITY_NAME_TO_ATTRIBUTE_NAME[quantity_name]
-        data = getattr(fluid, attribute_name)
-
-        temperatures = data['temperature']
-        values = data[attribute_name]
-        value_interpolated = np.interp(temperature, temperatures, values)
-
-        value_in_base_unit = value_interpolated * quantity_base_unit
-        value_in_current_unit = value_in_base_unit.to(quantity_current_unit)
-        st.session_state[quantity_key] = value_in_current_unit.magnitude
+        value_in_base_unit = fluid.at_temperature[attribute_name].evaluate(temperature)
+        st.session_state[quantity_key] = from_base_unit(value_in_base_unit, quantity_name, quantity_current_unit)
 
 
 def enable_or_disable_fluid_values_boxes():
@@ -156,9 +146,9 @@ def enable_or_disable_fluid_values_boxes():
     else:
         is_disabled = True
     
+    session_values = get_session_values()
     for key in ['Gravedad específica 0', 'Presión de vapor 0', 'Viscosidad 0', 'Velocidad del sonido 0']:
-        disabler_key = f'{key} is disabled'
-        st.session_state[disabler_key] = is_disabled
+        session_values.set_disabled(key, is_disabled)
 
 def update_fluid_values_boxes():
     fluid_name = st.session_state['Fluido']
@@ -1,64 +1,14 @@
 
 #encoding: utf-8
 
-from pathlib import Path
-import streamlit as st
-from PIL import Image
-from base64 import b64encode
-from io import BytesIO
+from core.constants import ROOT_PATH, IMG_PATH, DATA_PATH, CAVITATION_SAFETY_FACTOR, MAX_NOISE_LEVEL, UNITS_AS_STRING, BASE_UNITS, QUANTITY_NAME_TO_ATTRIBUTE_NAME
+from core.static_assets import load_static_assets
 
 
-def img_to_base64(img):
-    buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    return(b64encode(buffer.getvalue()).decode())
-
-@st.cache_data
-def load_images():
+def load_images(): #Encoded at build time, see core.static_assets
     images = {}
-    images['logo'] = img_to_base64(Image.open(IMG_PATH / 'Orbinox_logo.png'))
+    images['logo'] = load_static_assets()['logo']
     return(images)
 
 
-ROOT_PATH = Path(__file__).resolve().parent.parent
-IMG_PATH = ROOT_PATH / 'img'
-DATA_PATH = ROOT_PATH / 'data'
-
-CAVITATION_SAFETY_FACTOR = 0.8 #Multiplied by allowable pressure differential
-
 IMAGES = load_images()
-
-DEFAULTS = {'old_values': {}, #old_values always has pint quantities
-            'rerun': False, 
-            'Gravedad específica 0 is disabled': True, 
-            'Presión de vapor 0 is disabled': True, 
-            'Viscosidad 0 is disabled': True, 
-            'Velocidad del sonido 0 is disabled': True}
-
-UNITS_AS_STRING = {'Caudal': ['m³/h', 'L/min', 'GPM'], 
-                   'Presión': ['PSI', 'bar'], 
-                   'Temperatura': ['°C', '°F', '°K'], 
-                   'Gravedad específica': ['dimensionless'], 
-                   'Viscosidad': ['cSt'], 
-                   'Velocidad': ['m/s', 'ft/s', 'km/h', 'mph'], 
-                   'Apertura': ['%'], 
-                   'Cv': ['Cv'], 
-                   'Ruido': ['dB']} #Each unit is readable by an ureg call: ureg('m³/h'). The first unit is the canonical one.
-
-BASE_UNITS = {'Caudal': 'GPM', 
-              'Presión': 'PSI', 
-              'Temperatura': '°C', 
-              'Gravedad específica': 'dimensionless', 
-              'Presión de vapor': 'PSI', 
-              'Viscosidad': 'cSt', 
-              'Velocidad': 'ft/s', 
-              'Velocidad del sonido': 'ft/s', 
-              'Apertura': '%', 
-              'Cv': 'Cv', 
-              'Ruido': 'dB'}
-
-QUANTITY_NAME_TO_ATTRIBUTE_NAME = {'Gravedad específica': 'specific_gravity', 
-                                   'Presión de vapor': 'vapor_pressure', 
-                                   'Viscosidad': 'viscosity', 
-                                   'Velocidad del sonido': 'speed_of_sound'}
-
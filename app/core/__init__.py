@@ -0,0 +1,12 @@
+
+#encoding: utf-8
+
+#Streamlit-free sizing core: math, catalog and units. Data is loaded on first use, not on import.
+
+from core.sizing import Dimensionamiento, DimensionamientoBatch, get_dimensionable_and_available_diameters
+from core.catalog import Valve, Fluid, load_valves, load_fluids
+from core.units import get_ureg
+from core.selection import select_valves
+from core.curves import ValveCurve, get_curve, get_flow_vs_opening
+from core.timing import enable_timing, get_stage_timer
+from core.uncertainty import InputDistribution, run_monte_carlo
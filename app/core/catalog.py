@@ -0,0 +1,301 @@
+
+#encoding: utf-8
+
+import csv
+import threading
+import numpy as np
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
+from core.constants import DATA_PATH, VALVE_CACHE_SIZE, DENSE_LOOKUP_POINTS
+from core.interpolation import Interpolator, build_interpolator, get_dense_lookup_points, set_dense_lookup_points
+
+FLUID_PROPERTIES = ['specific_gravity', 'vapor_pressure', 'viscosity', 'speed_of_sound']
+FLUID_NAMES = ['Agua']
+
+provided_arrays = None #Set by use_catalog_arrays, e.g. views of a catalog in shared memory
+
+
+class Fluid: #Read-only once loaded, shared by every session
+
+    __slots__ = ('name', 'at_temperature')
+
+    def __init__(self, name, at_temperature: dict):
+        self.name = name
+        self.at_temperature: dict[str, Interpolator] = at_temperature #fluid.at_temperature['viscosity'].evaluate(temperature)
+
+    def __repr__(self):
+        return(self.name)
+
+    def frame(self, attribute_name): #For display only
+        import pandas as pd
+
+        data = self.at_temperature[attribute_name]
+        return(pd.DataFrame({'temperature': data.x, attribute_name: data.y}))
+
+class Valve: #Read-only once loaded, shared by every session
+
+    __slots__ = ('name', 'style', 'Cv', 'diameters', 'diameter_rows', 'openings', 'opening_at_Cv', 'FL_at_opening',
+                 'available_diameters', 'max_opening', 'Reynolds_factor', 'critical_pressure_ratio', 'max_velocity_without_erosion')
+
+    def __init__(self, name, style, FL_at_opening, Cv, diameters, openings, available_diameters, max_opening, Reynolds_factor, critical_pressure_ratio, max_velocity_without_erosion):
+        self.name = name
+        self.style = style
+        self.Cv: np.ndarray = read_only(Cv) #valve.Cv[valve.diameter_rows[diameter], opening_index] = Cv
+        self.diameters: np.ndarray = read_only(diameters)
+        self.diameter_rows: dict[float, int] = {float(diameter): row for row, diameter in enumerate(self.diameters)}
+        self.openings: np.ndarray = read_only(openings) #Sorted
+        self.FL_at_opening: Interpolator = FL_at_opening
+        self.available_diameters: tuple = tuple(available_diameters)
+        self.max_opening = max_opening
+        self.Reynolds_factor = Reynolds_factor
+        self.critical_pressure_ratio = critical_pressure_ratio
+        self.max_velocity_without_erosion = max_velocity_without_erosion
+
+        self.opening_at_Cv: dict[float, Interpolator] = {diameter: build_interpolator(self.Cv[row], self.openings) for diameter, row in self.diameter_rows.items()}
+
+    def __repr__(self):
+        return(self.name)
+
+    def Cvs_at(self, diameter): #Cv at every opening of self.openings
+        return(self.Cv[self.diameter_rows[diameter]])
+
+    def Cv_frame(self): #For display only, same layout as Cv.csv
+        import pandas as pd
+
+        return(pd.DataFrame(self.Cv, index = pd.Index(self.diameters, name = 'diameter'), columns = self.openings))
+
+    def FL_frame(self): #For display only
+        import pandas as pd
+
+        return(pd.DataFrame({'opening': self.FL_at_opening.x, 'FL': self.FL_at_opening.y}))
+
+
+def read_only(array):
+    array = np.array(array, dtype = float)
+    array.flags.writeable = False
+    return(array)
+
+def read_csv_rows(path):
+    with open(path, newline = '', encoding = 'utf-8') as file:
+        rows = [[cell.strip() for cell in row] for row in csv.reader(file) if row]
+    return(rows)
+
+def read_numeric_csv(path): #Header and float matrix
+    rows = read_csv_rows(path)
+    return(rows[0], np.array(rows[1:], dtype = float).reshape(len(rows) - 1, len(rows[0])))
+
+def read_two_column_csv(path): #x sorted ascending, like the old DataFrame.sort_values
+    _, table = read_numeric_csv(path)
+    order = np.argsort(table[:, 0], kind = 'stable')
+    return(table[order, 0], table[order, 1])
+
+def read_valve_sources(valve_name): #Tables of one valve folder, as stored in the compiled catalog
+    header, Cv_table = read_numeric_csv(DATA_PATH / 'valves' / valve_name / 'Cv.csv')
+    _, diameters_table = read_numeric_csv(DATA_PATH / 'valves' / valve_name / 'available_diameters.csv')
+
+    arrays = {}
+    arrays['diameters'] = Cv_table[:, 0]
+    arrays['openings'] = np.array(header[1:], dtype = float)
+    arrays['Cv'] = Cv_table[:, 1:]
+    arrays['FL'] = np.array(read_two_column_csv(DATA_PATH / 'valves' / valve_name / 'FL.csv'))
+    arrays['available_diameters'] = diameters_table[:, 0]
+    return(arrays)
+
+def read_catalog_sources():
+    arrays = {}
+    arrays['Reynolds_correction'] = np.array(read_two_column_csv(DATA_PATH / 'fluids' / 'Reynolds_correction_factor.csv'))
+
+    arrays['fluid_names'] = np.array(FLUID_NAMES)
+    for fluid_name in FLUID_NAMES:
+        for quantity in FLUID_PROPERTIES:
+            arrays[f'fluids/{fluid_name}/{quantity}'] = np.array(read_two_column_csv(DATA_PATH / 'fluids' / fluid_name / (quantity + '.csv')))
+
+    valve_names = [row[0] for row in read_csv_rows(DATA_PATH / 'valves' / 'valve_names.csv')]
+    valve_constants = [read_csv_rows(DATA_PATH / 'valves' / valve_name / 'constants.csv')[1] for valve_name in valve_names]
+    arrays['valve_names'] = np.array(valve_names)
+    arrays['valve_styles'] = np.array([constants[4] for constants in valve_constants])
+    arrays['valve_constants'] = np.array([constants[:4] for constants in valve_constants], dtype = float).reshape(len(valve_names), 4) #critical pressure ratio, Reynolds factor, max velocity without erosion, max opening
+    for valve_name in valve_names:
+        for key, array in read_valve_sources(valve_name).items():
+            arrays[f'valves/{valve_name}/{key}'] = array
+
+    from core.noise import read_noise_sources #core.noise imports this module
+
+    arrays.update(read_noise_sources())
+    return(arrays)
+
+def compile_catalog():
+    from core.catalog_cache import get_source_fingerprint, write_compiled_catalog
+
+    fingerprint = get_source_fingerprint() #Taken before reading, an edit during the build triggers another rebuild
+    arrays = read_catalog_sources()
+    write_compiled_catalog(arrays, fingerprint = fingerprint)
+    return(arrays)
+
+@lru_cache(maxsize = 1)
+def load_catalog_arrays(): #Compiled catalog if it is up to date, otherwise it is rebuilt from the CSVs first
+    from core.catalog_cache import open_compiled_catalog
+
+    if provided_arrays is not None:
+        return(provided_arrays)
+    compiled = open_compiled_catalog()
+    if compiled is not None:
+        return(compiled)
+    try:
+        arrays = compile_catalog()
+    except OSError: #Read-only data folder, every CSV stays in memory
+        return(read_catalog_sources())
+    compiled = open_compiled_catalog()
+    if compiled is None: #Sources changed while compiling
+        return(arrays)
+    return(compiled)
+
+@lru_cache(maxsize = 1)
+def get_catalog_version(): #Fingerprint of the CSVs behind the loaded catalog and the lookup mode, changes whenever either does
+    from core.catalog_cache import get_source_fingerprint
+
+    arrays = load_catalog_arrays()
+    fingerprint = str(arrays['fingerprint']) if 'fingerprint' in arrays else get_source_fingerprint()
+    return(f'{fingerprint}/dense_lookups={get_dense_lookup_points()}') #Dense lookups give slightly different results
+
+
+@lru_cache(maxsize = 1)
+def load_Reynolds_correction_interpolator():
+    Reynolds_numbers, correction_factors = load_catalog_arrays()['Reynolds_correction']
+    return(Interpolator(Reynolds_numbers, correction_factors)) #Always exact, it spans decades of Reynolds numbers and a uniform grid cannot follow it
+
+def load_fluid(fluid_name):
+    arrays = load_catalog_arrays()
+    at_temperature = {}
+    for quantity in FLUID_PROPERTIES:
+        temperatures, values = arrays[f'fluids/{fluid_name}/{quantity}']
+        at_temperature[quantity] = build_interpolator(temperatures, values)
+    return(Fluid(fluid_name, at_temperature))
+
+@lru_cache(maxsize = 1)
+def load_fluids():
+    fluids = {}
+    for fluid_name in load_catalog_arrays()['fluid_names']:
+        fluid_name = str(fluid_name)
+        fluids[fluid_name] = load_fluid(fluid_name)
+    fluids['Otro'] = Fluid('Otro', {})
+    return(fluids)
+
+
+class ValveSummary: #What the catalog index knows about a series without loading its tables
+
+    __slots__ = ('name', 'style', 'critical_pressure_ratio', 'Reynolds_factor', 'max_velocity_without_erosion', 'max_opening')
+
+    def __init__(self, name, style, critical_pressure_ratio, Reynolds_factor, max_velocity_without_erosion, max_opening):
+        self.name = name
+        self.style = style
+        self.critical_pressure_ratio = critical_pressure_ratio
+        self.Reynolds_factor = Reynolds_factor
+        self.max_velocity_without_erosion = max_velocity_without_erosion
+        self.max_opening = max_opening
+
+    def __repr__(self):
+        return(self.name)
+
+class ValveCatalog(Mapping): #valve_name -> Valve. Only the index is read on startup, Cv/FL tables on first access, kept in a bounded LRU
+
+    def __init__(self, arrays, max_loaded = VALVE_CACHE_SIZE):
+        self.arrays = arrays
+        self.summaries: dict[str, ValveSummary] = {}
+        for name, style, constants in zip(arrays['valve_names'], arrays['valve_styles'], arrays['valve_constants'].tolist()):
+            self.summaries[str(name)] = ValveSummary(str(name), str(style), *constants)
+
+        self.max_loaded = max_loaded
+        self.loaded: OrderedDict[str, Valve] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return(f'ValveCatalog({len(self)} series, {len(self.loaded)} loaded)')
+
+    def __len__(self):
+        return(len(self.summaries))
+
+    def __iter__(self):
+        return(iter(self.summaries))
+
+    def __contains__(self, valve_name):
+        return(valve_name in self.summaries)
+
+    def __getitem__(self, valve_name):
+        with self.lock:
+            valve = self.loaded.get(valve_name)
+            if valve is not None:
+                self.loaded.move_to_end(valve_name)
+                self.hits += 1
+                return(valve)
+        if valve_name not in self.summaries:
+            raise KeyError(valve_name)
+
+        valve = load_valve(self.arrays, self.summaries[valve_name]) #Outside the lock, two sessions may build the same valve once each
+        with self.lock:
+            self.misses += 1
+            self.loaded[valve_name] = valve
+            self.loaded.move_to_end(valve_name)
+            while len(self.loaded) > self.max_loaded:
+                self.loaded.popitem(last = False)
+                self.evictions += 1
+        return(valve)
+
+    def cache_info(self):
+        return({'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'loaded': len(self.loaded), 'max_loaded': self.max_loaded})
+
+def load_valve(arrays, summary: ValveSummary):
+    prefix = f'valves/{summary.name}/'
+
+    FL_openings, FLs = arrays[prefix + 'FL']
+    FL_at_opening = build_interpolator(FL_openings, FLs)
+    available_diameters = arrays[prefix + 'available_diameters'].tolist()
+
+    return(Valve(summary.name, summary.style, FL_at_opening, arrays[prefix + 'Cv'], arrays[prefix + 'diameters'], arrays[prefix + 'openings'], available_diameters,
+                 summary.max_opening, summary.Reynolds_factor, summary.critical_pressure_ratio, summary.max_velocity_without_erosion))
+
+@lru_cache(maxsize = 1)
+def load_valves():
+    return(ValveCatalog(load_catalog_arrays()))
+
+
+def use_dense_lookups(points = DENSE_LOOKUP_POINTS): #Cv, FL and fluid tables; None goes back to exact lookups. Tables are rebuilt on next use, objects already handed out keep their mode
+    from core import selection
+
+    set_dense_lookup_points(points)
+    for function in [get_catalog_version, load_fluids, load_valves, selection.get_max_Cv_index]:
+        function.cache_clear()
+
+def use_catalog_arrays(arrays): #Mapping with the same keys as the compiled catalog, None goes back to data/. Objects already handed out keep the old arrays
+    from core import selection, noise
+
+    global provided_arrays
+    provided_arrays = arrays
+    for function in [load_catalog_arrays, get_catalog_version, load_Reynolds_correction_interpolator, load_fluids, load_valves,
+                     selection.get_max_Cv_index, noise.load_noise_tables]:
+        function.cache_clear()
+
+def get_dense_lookup_errors(): #Largest difference with np.interp of every table, loads every series
+    errors = {}
+    for fluid in load_fluids().values():
+        for quantity, interpolator in fluid.at_temperature.items():
+            errors[f'fluids/{fluid.name}/{quantity}'] = interpolator.max_error
+    valves = load_valves()
+    for valve_name in valves:
+        valve = valves[valve_name]
+        errors[f'valves/{valve_name}/FL'] = valve.FL_at_opening.max_error
+        for diameter, interpolator in valve.opening_at_Cv.items():
+            errors[f'valves/{valve_name}/opening_at_Cv/{diameter:g}'] = interpolator.max_error
+    return(errors)
+
+
+def __getattr__(name): #core.catalog.VALVES and core.catalog.FLUIDS are loaded on first access
+    if name == 'VALVES':
+        return(load_valves())
+    if name == 'FLUIDS':
+        return(load_fluids())
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,85 @@
+
+#encoding: utf-8
+
+#Compiled catalog: every array of data/valves, data/fluids and data/noise packed in one .npz file, rebuilt when a source CSV changes.
+#Build it ahead of time (e.g. in the image) with: python -m core.catalog_cache
+
+import os
+import hashlib
+import tempfile
+import threading
+import numpy as np
+from core.constants import DATA_PATH, CATALOG_CACHE_PATH
+
+CATALOG_CACHE_FORMAT_VERSION = 2 #Bump when the layout of the arrays changes
+
+
+def get_source_paths():
+    paths = []
+    for folder in ['valves', 'fluids', 'noise']:
+        paths.extend(path for path in (DATA_PATH / folder).rglob('*.csv'))
+    return(sorted(paths))
+
+def get_source_fingerprint(): #Sizes and mtimes only, so checking it never parses a CSV
+    fingerprint = hashlib.sha256()
+    for path in get_source_paths():
+        stat = path.stat()
+        fingerprint.update(f'{path.relative_to(DATA_PATH).as_posix()}|{stat.st_size}|{stat.st_mtime_ns}\n'.encode('utf-8'))
+    return(fingerprint.hexdigest())
+
+def write_compiled_catalog(arrays: dict, path = CATALOG_CACHE_PATH, fingerprint = None):
+    if fingerprint is None:
+        fingerprint = get_source_fingerprint()
+    arrays = dict(arrays)
+    arrays['format_version'] = np.array(CATALOG_CACHE_FORMAT_VERSION)
+    arrays['fingerprint'] = np.array(fingerprint)
+
+    file_descriptor, temporary_path = tempfile.mkstemp(dir = path.parent, prefix = path.stem, suffix = '.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            np.savez(file, **arrays)
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, path) #Atomic, concurrent replicas never read a half-written file
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+class CompiledCatalog: #Keeps the file open and reads each array on first use, so memory only grows with what is used
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.keys = set(compiled.files)
+        self.lock = threading.Lock() #NpzFile reads are not thread safe
+
+    def __getitem__(self, key):
+        with self.lock:
+            return(self.compiled[key])
+
+    def __contains__(self, key):
+        return(key in self.keys)
+
+    def __iter__(self):
+        return(iter(self.keys))
+
+    def close(self):
+        self.compiled.close()
+
+def open_compiled_catalog(path = CATALOG_CACHE_PATH): #None if missing, from another format version or older than its sources
+    try:
+        compiled = np.load(path, allow_pickle = False)
+    except (OSError, ValueError):
+        return(None)
+    try:
+        is_valid = int(compiled['format_version']) == CATALOG_CACHE_FORMAT_VERSION and str(compiled['fingerprint']) == get_source_fingerprint()
+    except (OSError, KeyError, ValueError):
+        is_valid = False
+    if not is_valid:
+        compiled.close()
+        return(None)
+    return(CompiledCatalog(compiled))
+
+if __name__ == '__main__':
+    from core.catalog import compile_catalog
+
+    compile_catalog()
+    print(f'Catalog compiled into {CATALOG_CACHE_PATH}')
@@ -0,0 +1,57 @@
+
+#encoding: utf-8
+
+from pathlib import Path
+
+
+ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+IMG_PATH = ROOT_PATH / 'img'
+DATA_PATH = ROOT_PATH / 'data'
+CATALOG_CACHE_PATH = DATA_PATH / 'catalog.npz' #Built from data/valves and data/fluids, see core.catalog_cache
+STATIC_ASSETS_PATH = DATA_PATH / 'static_assets.json' #Logo as base64 and unit conversion table, see core.static_assets
+
+VALVE_CACHE_SIZE = 32 #Series whose Cv/FL tables stay loaded, least recently used ones are dropped first
+DENSE_LOOKUP_POINTS = 4097 #Grid of the optional dense lookup tables, see core.interpolation.UniformGridInterpolator
+CURVE_POINTS = 501 #Openings per cached valve curve, plus the table's own
+CURVE_CACHE_SIZE = 256 #(series, diameter) curves kept per process
+
+CAVITATION_SAFETY_FACTOR = 0.8 #Multiplied by allowable pressure differential
+MAX_NOISE_LEVEL = 85 #dB(A), usual limit for continuous exposure without hearing protection
+ATMOSPHERIC_PRESSURE = 14.7 #PSI. Inlet and outlet pressures are gauge, vapor pressures from data/fluids are absolute
+
+UNITS_AS_STRING = {'Caudal': ['m³/h', 'L/min', 'GPM'], 
+                   'Presión': ['PSI', 'bar'], 
+                   'Temperatura': ['°C', '°F', '°K'], 
+                   'Gravedad específica': ['dimensionless'], 
+                   'Viscosidad': ['cSt'], 
+                   'Velocidad': ['m/s', 'ft/s', 'km/h', 'mph'], 
+                   'Apertura': ['%'], 
+                   'Cv': ['Cv'], 
+                   'Ruido': ['dB']} #Each unit is readable by an ureg call: ureg('m³/h'). The first unit is the canonical one.
+
+BASE_UNITS = {'Caudal': 'GPM', 
+              'Presión': 'PSI', 
+              'Temperatura': '°C', 
+              'Gravedad específica': 'dimensionless', 
+              'Presión de vapor': 'PSI', 
+              'Viscosidad': 'cSt', 
+              'Velocidad': 'ft/s', 
+              'Velocidad del sonido': 'ft/s', 
+              'Apertura': '%', 
+              'Cv': 'Cv', 
+              'Ruido': 'dB'}
+
+QUANTITY_NAME_TO_ATTRIBUTE_NAME = {'Gravedad específica': 'specific_gravity', 
+                                   'Presión de vapor': 'vapor_pressure', 
+                                   'Viscosidad': 'viscosity', 
+                                   'Velocidad del sonido': 'speed_of_sound'}
+
+INPUT_UNITS = {'flow': 'GPM',
+               'in_pressure': 'PSI',
+               'pressure_differential': 'PSI',
+               'out_pressure': 'PSI',
+               'temperature': '°C',
+               'vapor_pressure': 'PSI',
+               'viscosity': 'cSt'} #Base units of core.sizing by input name, for the CLIs and the service. Diameter is always in inches
+OUTPUT_COLUMNS = ['Reynolds_number', 'correction_factor', 'Cv', 'opening', 'FL', 'allowable_pressure_differential', 'velocity', 'noise'] #DimensionamientoBatch attributes
+FLAG_COLUMNS = ['opening_too_big', 'opening_too_small', 'is_cavitating', 'is_eroding', 'is_noisy']
@@ -0,0 +1,47 @@
+
+#encoding: utf-8
+
+#Valve characteristics at fine resolution, computed once per (series, diameter) and shared by every session.
+
+import numpy as np
+from functools import lru_cache
+from core.constants import CURVE_POINTS, CURVE_CACHE_SIZE
+from core.catalog import Valve, load_valves, get_catalog_version
+
+
+class ValveCurve: #Cv against opening for one valve and diameter, read-only
+
+    __slots__ = ('valve_name', 'diameter', 'openings', 'Cvs')
+
+    def __init__(self, valve: Valve, diameter, points = CURVE_POINTS):
+        self.valve_name = valve.name
+        self.diameter = diameter
+        openings = np.linspace(valve.openings[0], valve.openings[-1], points)
+        openings = np.union1d(openings, valve.openings) #Table points stay exact corners of the curve
+        Cvs = np.interp(openings, valve.openings, valve.Cvs_at(diameter)) #Same linear interpolation as the sizing
+        openings.flags.writeable = False
+        Cvs.flags.writeable = False
+        self.openings: np.ndarray = openings
+        self.Cvs: np.ndarray = Cvs
+
+    def __repr__(self):
+        return(f'ValveCurve({self.valve_name} {self.diameter:g} in, {len(self.openings)} points)')
+
+    def flows_at(self, pressure_differential, specific_gravity): #GPM at every opening, one row per (ΔP, SG) if arrays are given
+        pressure_differential = np.asarray(pressure_differential, dtype = float)[..., np.newaxis]
+        specific_gravity = np.asarray(specific_gravity, dtype = float)[..., np.newaxis]
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            flows = self.Cvs * (pressure_differential / specific_gravity)**(1/2) #Turbulent flow, no viscosity correction
+        return(flows)
+
+
+@lru_cache(maxsize = CURVE_CACHE_SIZE)
+def load_curve(valve_name, diameter, catalog_version): #catalog_version only keys the cache, a new catalog gets new curves
+    return(ValveCurve(load_valves()[valve_name], diameter))
+
+def get_curve(valve: Valve, diameter):
+    return(load_curve(valve.name, float(diameter), get_catalog_version()))
+
+def get_flow_vs_opening(valve: Valve, diameter, pressure_differential, specific_gravity): #openings, flows, base units
+    curve = get_curve(valve, diameter)
+    return(curve.openings, curve.flows_at(pressure_differential, specific_gravity))
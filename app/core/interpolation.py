@@ -0,0 +1,149 @@
+
+#encoding: utf-8
+
+import os
+import numpy as np
+from bisect import bisect_right
+from core.constants import DENSE_LOOKUP_POINTS
+
+DENSE_LOOKUPS_ENV_VAR = 'DIMENSIONAMIENTO_DENSE_LOOKUPS' #'1' for DENSE_LOOKUP_POINTS, or a number of grid points
+
+
+class Interpolator: #Same results as np.interp(x, self.x, self.y), built once per table instead of on every lookup
+
+    def __init__(self, x, y):
+        x = as_read_only_array(x)
+        y = as_read_only_array(y)
+        if x.ndim != 1 or x.shape != y.shape or len(x) == 0:
+            raise ValueError('x and y must be non-empty 1-D arrays of the same length')
+        if np.any(np.diff(x) < 0):
+            raise ValueError('x must be increasing')
+
+        dx = np.diff(x)
+        dy = np.diff(y)
+        slopes = np.divide(dy, dx, out = np.zeros_like(dy), where = dx != 0)
+        slopes = np.append(slopes, 0.0) #Past the last point the value stays at y[-1]
+        slopes.flags.writeable = False
+        self.x = x
+        self.y = y
+        self.slopes = slopes
+
+        self._x_list = x.tolist() #bisect on a list beats np.searchsorted for a single value
+        self._y_list = y.tolist()
+        self._slopes_list = slopes.tolist()
+
+    def __len__(self):
+        return(len(self.x))
+
+    def __repr__(self):
+        return(f'Interpolator({len(self)} points, x from {self._x_list[0]} to {self._x_list[-1]})')
+
+    def evaluate(self, value): #Single float, None stays None
+        if value is None:
+            return(None)
+        if value != value:
+            return(float('nan'))
+        if value < self._x_list[0]:
+            return(self._y_list[0])
+        if value >= self._x_list[-1]:
+            return(self._y_list[-1])
+
+        index = bisect_right(self._x_list, value) - 1
+        return(self._y_list[index] + self._slopes_list[index] * (value - self._x_list[index]))
+
+    def evaluate_array(self, values): #NaN stays NaN
+        values = np.asarray(values, dtype = float)
+        indices = np.searchsorted(self.x, values, side = 'right') - 1
+        np.clip(indices, 0, len(self.x) - 1, out = indices)
+
+        with np.errstate(invalid = 'ignore'): #inf * 0 past the ends, replaced below
+            interpolated = self.y[indices] + self.slopes[indices] * (values - self.x[indices])
+        interpolated = np.where(values < self.x[0], self.y[0], interpolated)
+        interpolated = np.where(values >= self.x[-1], self.y[-1], interpolated)
+        return(interpolated)
+
+
+class UniformGridInterpolator(Interpolator): #Table resampled onto a uniform grid, a lookup is index arithmetic instead of a search
+    #Both the table and the grid are piecewise linear and agree on the grid points, so the largest difference with
+    #np.interp(x, self.x, self.y) is at one of the table's own points. It is measured there and kept in self.max_error;
+    #for a kink it is at most |change of slope| * step / 4, a vertical step in the table stays fully within one grid step.
+
+    def __init__(self, x, y, points = DENSE_LOOKUP_POINTS):
+        super().__init__(x, y) #self.x and self.y stay the original table
+        start = self._x_list[0]
+        stop = self._x_list[-1]
+        if stop > start:
+            grid_x = np.linspace(start, stop, points)
+        else: #Single point, or every x equal
+            grid_x = np.array([start, start + 1.0])
+        grid_y = np.interp(grid_x, self.x, self.y)
+        grid_slopes = np.append(np.diff(grid_y), 0.0) #Per grid step
+
+        self.start = start
+        self.inverse_step = (len(grid_x) - 1) / (grid_x[-1] - grid_x[0])
+        self.last_index = len(grid_x) - 1
+        self.grid_y = read_only(grid_y)
+        self.grid_slopes = read_only(grid_slopes)
+        self._grid_y_list = grid_y.tolist()
+        self._grid_slopes_list = grid_slopes.tolist()
+        self.max_error = float(np.max(np.abs(self.evaluate_array(self.x) - self.y)))
+
+    def __repr__(self):
+        return(f'UniformGridInterpolator({len(self)} points on a {self.last_index + 1} point grid, max error {self.max_error:.3g})')
+
+    def evaluate(self, value): #Single float, None stays None
+        if value is None:
+            return(None)
+        if value != value:
+            return(float('nan'))
+        position = (value - self.start) * self.inverse_step
+        if position <= 0:
+            return(self._grid_y_list[0])
+        if position >= self.last_index:
+            return(self._grid_y_list[-1])
+
+        index = int(position)
+        return(self._grid_y_list[index] + self._grid_slopes_list[index] * (position - index))
+
+    def evaluate_array(self, values): #NaN stays NaN
+        values = np.asarray(values, dtype = float)
+        positions = np.clip((values - self.start) * self.inverse_step, 0, self.last_index)
+        with np.errstate(invalid = 'ignore'): #NaN positions, the result is NaN anyway
+            indices = positions.astype(np.intp)
+        np.clip(indices, 0, self.last_index, out = indices)
+        return(self.grid_y[indices] + self.grid_slopes[indices] * (positions - indices))
+
+
+def read_dense_lookup_setting(): #None unless dense lookups are enabled
+    setting = os.environ.get(DENSE_LOOKUPS_ENV_VAR, '')
+    if setting in ['', '0']:
+        return(None)
+    if setting == '1':
+        return(DENSE_LOOKUP_POINTS)
+    return(int(setting))
+
+dense_lookup_points = read_dense_lookup_setting()
+
+def get_dense_lookup_points():
+    return(dense_lookup_points)
+
+def set_dense_lookup_points(points): #None goes back to Interpolator; tables built before keep their mode, see core.catalog.use_dense_lookups
+    global dense_lookup_points
+    dense_lookup_points = points
+
+def build_interpolator(x, y): #Every catalog table goes through here, so the lookup mode is chosen in one place
+    if dense_lookup_points is None:
+        return(Interpolator(x, y))
+    return(UniformGridInterpolator(x, y, dense_lookup_points))
+
+def read_only(array):
+    array = np.array(array, dtype = float)
+    array.flags.writeable = False
+    return(array)
+
+def as_read_only_array(values): #Read-only float64 arrays (e.g. rows of Valve.Cv) are shared, anything else is copied
+    array = np.asarray(values, dtype = float)
+    if array.flags.writeable or not array.flags.c_contiguous:
+        array = np.array(array, dtype = float)
+        array.flags.writeable = False
+    return(array)
@@ -0,0 +1,147 @@
+
+#encoding: utf-8
+
+#Liquid noise estimate, dB(A) = factor A + factor B + factor C
+#https://www.isa.org/intech-home/2018/july-august/departments/control-valve-noise-estimating-made-easy
+#Factors A and C are read off the article's charts, digitized into data/noise:
+#   factor_A.csv: header 'curve_number,<diameter>,<diameter>,...' (inches), one row per curve number Cv/d² with dB values, like Cv.csv
+#   factor_C.csv: columns X_10, not_cavitating, cavitating (dB)
+#The repo ships no digitized charts yet, so noise is inert: it stays NaN (None in Dimensionamiento), is_noisy is never set
+#and the page does not list the noise warning, until both files are added.
+#X_10 = 10 ΔP / (P1 - Pv) takes absolute pressures, like the allowable pressure differential: the gauge inlet pressure gets
+#ATMOSPHERIC_PRESSURE added, the vapor pressure is absolute already. The old draft subtracted an absolute Pv from a gauge P1.
+
+import numpy as np
+from bisect import bisect_left
+from math import log10
+from functools import lru_cache
+from core.constants import DATA_PATH, ATMOSPHERIC_PRESSURE
+from core.interpolation import Interpolator
+from core.catalog import read_numeric_csv, load_catalog_arrays
+
+NOISE_DATA_PATH = DATA_PATH / 'noise'
+
+
+class NoiseTables: #Factor A and C charts as interpolators, built once per process
+
+    def __init__(self, curve_numbers, diameters, factor_A, X_10, factor_C_not_cavitating, factor_C_cavitating):
+        self.curve_numbers = np.array(curve_numbers, dtype = float) #Sorted
+        if len(self.curve_numbers) < 2:
+            raise ValueError('factor A needs at least two curves')
+        self._curve_numbers_list = self.curve_numbers.tolist()
+        self.factor_A_at_diameter = [Interpolator(diameters, row) for row in factor_A] #One per curve number
+        self.factor_C_not_cavitating = Interpolator(X_10, factor_C_not_cavitating)
+        self.factor_C_cavitating = Interpolator(X_10, factor_C_cavitating)
+
+    def __repr__(self):
+        return(f'NoiseTables({len(self.curve_numbers)} factor A curves, {len(self.factor_C_not_cavitating)} factor C points)')
+
+    def get_factor_A(self, Cv, diameter):
+        Cv, diameter = np.broadcast_arrays(np.asarray(Cv, dtype = float), np.asarray(diameter, dtype = float))
+        curve_number = Cv / diameter**2
+        on_curves = np.array([interpolator.evaluate_array(diameter) for interpolator in self.factor_A_at_diameter]) #curve x point
+
+        #Linear between the two curves around curve_number; below the first one it is used as is, above the last one there is no data
+        above = np.clip(np.searchsorted(self.curve_numbers, curve_number, side = 'left'), 1, len(self.curve_numbers) - 1)
+        below = above - 1
+        below_dB = np.take_along_axis(on_curves, below[np.newaxis], axis = 0)[0]
+        above_dB = np.take_along_axis(on_curves, above[np.newaxis], axis = 0)[0]
+        weight = np.clip((curve_number - self.curve_numbers[below]) / (self.curve_numbers[above] - self.curve_numbers[below]), 0, 1)
+        factor_A = below_dB + weight * (above_dB - below_dB)
+        factor_A = np.where(curve_number > self.curve_numbers[-1], np.nan, factor_A)
+        return(factor_A)
+
+    def get_factor_A_at_point(self, Cv, diameter): #Same as get_factor_A for one float, without NumPy overhead
+        curve_number = Cv / diameter**2
+        curve_numbers = self._curve_numbers_list
+        if not curve_number <= curve_numbers[-1]: #Also NaN
+            return(float('nan'))
+        above = min(max(bisect_left(curve_numbers, curve_number), 1), len(curve_numbers) - 1)
+        below = above - 1
+        below_dB = self.factor_A_at_diameter[below].evaluate(diameter)
+        above_dB = self.factor_A_at_diameter[above].evaluate(diameter)
+        weight = min(max((curve_number - curve_numbers[below]) / (curve_numbers[above] - curve_numbers[below]), 0.0), 1.0)
+        return(below_dB + weight * (above_dB - below_dB))
+
+    def get_factor_C(self, X_10, is_cavitating):
+        factor_C = np.where(is_cavitating,
+                            self.factor_C_cavitating.evaluate_array(X_10),
+                            self.factor_C_not_cavitating.evaluate_array(X_10))
+        factor_C = np.where(X_10 < 1, 0.0, factor_C) #NaN stays NaN
+        return(factor_C)
+
+    def get_factor_C_at_point(self, X_10, is_cavitating):
+        if X_10 < 1:
+            return(0.0)
+        if is_cavitating:
+            return(self.factor_C_cavitating.evaluate(X_10))
+        return(self.factor_C_not_cavitating.evaluate(X_10))
+
+
+def get_noise_factor_B(in_pressure): #Same formula as the old scalar get_noise_factor_B
+    in_pressure = np.asarray(in_pressure, dtype = float)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        factor_B = 35 * np.log10(in_pressure) - 35
+    factor_B = np.where(in_pressure <= 10, 0.0, factor_B)
+    return(factor_B)
+
+def get_noise_factor_B_at_point(in_pressure):
+    if in_pressure <= 10:
+        return(0.0)
+    return(35 * log10(in_pressure) - 35)
+
+def predict_noise(Cv, diameter, in_pressure, pressure_differential, vapor_pressure, is_cavitating, tables = None):
+    #Arrays or floats in base units, NaN where it cannot be estimated
+    if tables is None:
+        tables = load_noise_tables()
+    Cv, diameter, in_pressure, pressure_differential, vapor_pressure, is_cavitating = np.broadcast_arrays(
+        *[np.asarray(value, dtype = float) for value in [Cv, diameter, in_pressure, pressure_differential, vapor_pressure, is_cavitating]])
+    if tables is None:
+        return(np.full(Cv.shape, np.nan))
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        absolute_pressure_margin = in_pressure + ATMOSPHERIC_PRESSURE - vapor_pressure #Absolute pressures, see the header
+        X_10 = np.where(absolute_pressure_margin > 0, 10 * pressure_differential / absolute_pressure_margin, np.nan)
+        noise = tables.get_factor_A(Cv, diameter) + get_noise_factor_B(in_pressure) + tables.get_factor_C(X_10, is_cavitating == 1)
+    return(noise)
+
+def predict_noise_at_point(Cv, diameter, in_pressure, pressure_differential, vapor_pressure, is_cavitating, tables = None):
+    #Floats in base units, same result as predict_noise
+    if tables is None:
+        tables = load_noise_tables()
+    if tables is None:
+        return(float('nan'))
+
+    absolute_pressure_margin = in_pressure + ATMOSPHERIC_PRESSURE - vapor_pressure
+    if absolute_pressure_margin <= 0:
+        return(float('nan'))
+    X_10 = 10 * pressure_differential / absolute_pressure_margin
+    return(tables.get_factor_A_at_point(Cv, diameter) + get_noise_factor_B_at_point(in_pressure) + tables.get_factor_C_at_point(X_10, is_cavitating))
+
+
+def read_noise_sources(): #Arrays stored in the compiled catalog, empty if data/noise is missing
+    if not (NOISE_DATA_PATH / 'factor_A.csv').exists() or not (NOISE_DATA_PATH / 'factor_C.csv').exists():
+        return({})
+    header, factor_A_table = read_numeric_csv(NOISE_DATA_PATH / 'factor_A.csv')
+    _, factor_C_table = read_numeric_csv(NOISE_DATA_PATH / 'factor_C.csv')
+    order = np.argsort(factor_A_table[:, 0], kind = 'stable')
+    factor_C_table = factor_C_table[np.argsort(factor_C_table[:, 0], kind = 'stable')]
+
+    arrays = {}
+    arrays['noise/curve_numbers'] = factor_A_table[order, 0]
+    arrays['noise/diameters'] = np.array(header[1:], dtype = float)
+    arrays['noise/factor_A'] = factor_A_table[order, 1:]
+    arrays['noise/factor_C'] = factor_C_table[:, :3].T #X_10, not cavitating, cavitating
+    return(arrays)
+
+@lru_cache(maxsize = 1)
+def load_noise_tables(): #None without data/noise
+    arrays = load_catalog_arrays()
+    if 'noise/factor_A' not in arrays:
+        return(None)
+    X_10, factor_C_not_cavitating, factor_C_cavitating = arrays['noise/factor_C']
+    return(NoiseTables(arrays['noise/curve_numbers'], arrays['noise/diameters'], arrays['noise/factor_A'],
+                       X_10, factor_C_not_cavitating, factor_C_cavitating))
+
+def is_noise_available(): #False without data/noise, noise and is_noisy are then inert
+    return(load_noise_tables() is not None)
@@ -0,0 +1,112 @@
+
+#encoding: utf-8
+
+import numpy as np
+from functools import lru_cache
+from core.catalog import load_valves
+from core.sizing import DimensionamientoBatch, as_float_array, get_dimensionable_and_available_diameters
+
+MIN_RECOMMENDED_OPENING = 20
+MAX_RECOMMENDED_OPENING = 80
+
+
+class MaxCvIndex: #Every (valve, diameter) of the catalog sorted by its Cv at max opening
+
+    def __init__(self, valves: dict):
+        entries = []
+        for valve in valves.values():
+            for diameter in get_dimensionable_and_available_diameters(valve):
+                max_Cv = valve.opening_at_Cv[diameter].x[-1]
+                entries.append((float(max_Cv), valve.name, diameter))
+        entries.sort(key = lambda entry: entry[0])
+
+        self.valves = valves
+        self.max_Cvs = np.array([entry[0] for entry in entries], dtype = float)
+        self.valve_names = [entry[1] for entry in entries]
+        self.diameters = [entry[2] for entry in entries]
+
+    def __len__(self):
+        return(len(self.max_Cvs))
+
+    def candidates_for(self, required_Cv): #Sizes that reach required_Cv before max opening
+        first = np.searchsorted(self.max_Cvs, required_Cv, side = 'left')
+        for position in range(first, len(self)):
+            yield(self.valves[self.valve_names[position]], self.diameters[position])
+
+
+class Candidate:
+
+    def __init__(self, dimensionamientos: DimensionamientoBatch):
+        self.valve = dimensionamientos.valve
+        self.diameter = dimensionamientos.diameter
+        self.dimensionamientos = dimensionamientos
+
+        opening = dimensionamientos.opening
+        self.opening_margin = nanmin_or_nan(np.minimum(opening - MIN_RECOMMENDED_OPENING, MAX_RECOMMENDED_OPENING - opening)) #% points, negative outside 20-80%
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            cavitation_margins = 1 - dimensionamientos.pressure_differential / dimensionamientos.allowable_pressure_differential
+        self.cavitation_margin = nanmin_or_nan(cavitation_margins) #Fraction of allowable pressure differential left
+        self.erosion_margin = nanmin_or_nan(1 - dimensionamientos.velocity / self.valve.max_velocity_without_erosion) #Fraction of erosion velocity left
+
+        self.opening_too_big = bool(np.any(dimensionamientos.opening_too_big))
+        self.opening_too_small = bool(np.any(dimensionamientos.opening_too_small))
+        self.is_cavitating = bool(np.any(dimensionamientos.is_cavitating))
+        self.is_eroding = bool(np.any(dimensionamientos.is_eroding))
+
+    def __repr__(self):
+        return(f'{self.valve} {self.diameter} in (opening margin {self.opening_margin:.1f}, cavitation margin {self.cavitation_margin:.2f}, erosion margin {self.erosion_margin:.2f})')
+
+    def ranking_key(self): #Oversized ones (some point below 20% opening) last, unknown margins (NaN) after known ones
+        return((self.opening_too_small,
+                -np.nan_to_num(self.opening_margin, nan = -np.inf),
+                -np.nan_to_num(self.cavitation_margin, nan = -np.inf),
+                -np.nan_to_num(self.erosion_margin, nan = -np.inf)))
+
+
+def nanmin_or_nan(values): #Worst point, ignoring points that could not be sized
+    if np.all(np.isnan(values)):
+        return(np.nan)
+    return(float(np.nanmin(values)))
+
+@lru_cache(maxsize = 1)
+def get_max_Cv_index():
+    return(MaxCvIndex(load_valves()))
+
+def select_valves(flow, in_pressure, pressure_differential, specific_gravity, vapor_pressure, viscosity,
+                  index: MaxCvIndex | None = None,
+                  allow_cavitation = False,
+                  allow_erosion = False):
+    #flow, in_pressure and pressure_differential hold the operating envelope (e.g. min/normal/max), all in base units
+    if index is None:
+        index = get_max_Cv_index()
+
+    flow, in_pressure, pressure_differential, specific_gravity, vapor_pressure, viscosity = np.broadcast_arrays(
+        *[np.atleast_1d(as_float_array(value)) for value in [flow, in_pressure, pressure_differential, specific_gravity, vapor_pressure, viscosity]])
+    given = ~(np.isnan(flow) | np.isnan(pressure_differential))
+    if not np.any(given):
+        return([])
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        required_Cv = np.nanmax(flow[given] * (specific_gravity[given] / pressure_differential[given])**(1/2)) #Viscosity correction only makes it bigger
+    if np.isnan(required_Cv):
+        return([])
+
+    candidates = []
+    for valve, diameter in index.candidates_for(required_Cv):
+        dimens = DimensionamientoBatch(valve, float(diameter),
+                                       flow[given], in_pressure[given], pressure_differential[given],
+                                       specific_gravity[given], vapor_pressure[given], viscosity[given])
+        dimens.calculate_outputs()
+        dimens.set_flags()
+        candidate = Candidate(dimens)
+
+        if candidate.opening_too_big:
+            continue
+        if candidate.is_cavitating and not allow_cavitation:
+            continue
+        if candidate.is_eroding and not allow_erosion:
+            continue
+        candidates.append(candidate)
+
+    candidates.sort(key = Candidate.ranking_key)
+    return(candidates)
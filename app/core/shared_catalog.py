@@ -0,0 +1,76 @@
+
+#encoding: utf-8
+
+#Compiled catalog copied once into shared memory, so worker processes read the same arrays instead of each loading data/ again.
+#The owner creates it and unlinks it when done; workers attach with the picklable (name, layout) handle.
+
+import numpy as np
+from multiprocessing import shared_memory
+from core.catalog import load_catalog_arrays, use_catalog_arrays
+from core.interpolation import set_dense_lookup_points
+
+ALIGNMENT = 64 #Bytes, every array starts on a cache line
+
+attached = None #SharedCatalog of this worker process, kept alive while its arrays are in use
+
+
+class SharedCatalog:
+
+    def __init__(self, memory: shared_memory.SharedMemory, layout, is_owner):
+        self.memory = memory
+        self.layout = layout #(key, dtype, shape, offset) per array
+        self.is_owner = is_owner
+        self.arrays = {}
+        for key, dtype, shape, offset in layout:
+            array = np.ndarray(shape, dtype = np.dtype(dtype), buffer = memory.buf, offset = offset)
+            array.flags.writeable = False
+            self.arrays[key] = array
+
+    def __repr__(self):
+        return(f'SharedCatalog({self.memory.name}, {len(self.arrays)} arrays, {self.memory.size} bytes)')
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exception):
+        self.close()
+
+    @property
+    def handle(self): #What a worker needs to attach
+        return((self.memory.name, self.layout))
+
+    @classmethod
+    def create(cls, arrays = None): #Copies every array of the catalog, the loaded one by default
+        if arrays is None:
+            arrays = load_catalog_arrays()
+        keys = sorted(arrays)
+        contents = [np.asarray(arrays[key]) for key in keys]
+
+        layout = []
+        size = 0
+        for key, array in zip(keys, contents):
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            layout.append((key, array.dtype.str, array.shape, size))
+            size += array.nbytes
+        memory = shared_memory.SharedMemory(create = True, size = max(size, 1))
+        for (_, dtype, shape, offset), array in zip(layout, contents):
+            np.ndarray(shape, dtype = np.dtype(dtype), buffer = memory.buf, offset = offset)[...] = array
+        return(cls(memory, layout, is_owner = True))
+
+    @classmethod
+    def attach(cls, name, layout):
+        return(cls(shared_memory.SharedMemory(name = name), layout, is_owner = False))
+
+    def close(self): #Arrays handed out must not be used afterwards
+        self.arrays = {}
+        self.memory.close()
+        if self.is_owner:
+            self.memory.unlink()
+
+
+def attach_shared_catalog(handle, dense_lookup_points): #ProcessPoolExecutor initializer: the worker's catalog reads the shared arrays from now on
+    global attached
+
+    set_dense_lookup_points(dense_lookup_points) #Same lookup mode as the parent, also with the spawn start method
+    attached = SharedCatalog.attach(*handle)
+    use_catalog_arrays(attached.arrays)
@@ -0,0 +1,339 @@
+
+#encoding: utf-8
+
+import numpy as np
+from math import pi as PI
+from core.constants import CAVITATION_SAFETY_FACTOR, MAX_NOISE_LEVEL, ATMOSPHERIC_PRESSURE
+from core.catalog import Valve, Fluid, FLUID_PROPERTIES, load_Reynolds_correction_interpolator
+from core.noise import is_noise_available, predict_noise, predict_noise_at_point
+from core.timing import get_stage_timer
+
+class Dimensionamiento:
+
+    def __init__(self, valve, fluid, flow, in_pressure, pressure_differential, diameter, specific_gravity, vapor_pressure, viscosity):
+        self.valve: Valve | None = valve
+        self.fluid: Fluid | None = fluid
+        self.flow = flow
+        self.in_pressure = in_pressure
+        self.pressure_differential = pressure_differential
+        self.diameter = diameter
+        self.specific_gravity = specific_gravity
+        self.vapor_pressure = vapor_pressure
+        self.viscosity = viscosity
+
+        self.Reynolds_number = None
+        self.correction_factor = None
+        self.Cv = None
+        self.opening = None
+        self.FL = None
+        self.allowable_pressure_differential = None
+        self.velocity = None
+        self.noise = None
+
+        self.is_cavitating = None
+        self.is_flashing = None
+        self.is_eroding = None
+        self.opening_too_small = None
+        self.opening_too_big = None
+        #ADD VAPOR PRESSURE MORE THAN P1 (LIQUID IS STEAM)
+        self.is_noisy = None #eventualmente
+    
+    def __repr__(self):
+        attribute_lines = []
+        for name, value in self.__dict__.items():
+            attribute_line = f'{name} = {value}\n'
+            attribute_lines.append(attribute_line)
+        attributes_string = ''.join(attribute_lines)
+        return(attributes_string)
+
+    def calculate_Reynolds_number(self):
+        if self.flow is None or self.diameter is None or self.viscosity is None or self.valve is None:
+            return(None)
+        
+        Reynolds_number = calculate_Reynolds_numbers(self.valve, self.diameter, self.flow, self.viscosity) #CHEQUEAR FACTOR PARA OTRO TIPO DE VÁLVULAS
+        return(Reynolds_number)
+
+    def get_Reynolds_correction_factor(self):
+        if self.Reynolds_number is None:
+            return(None)
+        if self.Reynolds_number > 4999.9:
+            return(1.0)
+        if self.Reynolds_number < 0.011:
+            return(240.0)
+        
+        interpolated_correction_factor = load_Reynolds_correction_interpolator().evaluate(self.Reynolds_number)
+        return(interpolated_correction_factor)
+
+    def calculate_Cv(self):
+        if self.specific_gravity is None or self.flow is None or self.pressure_differential is None:
+            return(None)
+        
+        Cv = self.flow * (self.specific_gravity / self.pressure_differential)**(1/2)
+        return(Cv)
+
+    def calculate_opening(self):
+        if self.Cv is None or self.diameter is None or self.valve is None:
+            return(None)
+        
+        opening_at_Cv = self.valve.opening_at_Cv[self.diameter]
+        max_Cv = opening_at_Cv.x[-1]
+        if self.Cv > max_Cv:
+            return(self.valve.max_opening + 1)
+        
+        interpolated_opening = opening_at_Cv.evaluate(self.Cv)
+        return(interpolated_opening)
+
+    def get_FL(self):
+        if self.opening is None or self.valve is None:
+            return(None)
+        if self.opening > self.valve.max_opening or self.opening < 10:
+            return(None)
+        
+        interpolated_FL = self.valve.FL_at_opening.evaluate(self.opening)
+        return(interpolated_FL)
+
+    def calculate_allowable_pressure_differential_without_cavitation(self):
+        if self.FL is None or self.in_pressure is None or self.vapor_pressure is None or self.valve is None:
+            return(None)
+        
+        allowable_pressure_differential = self.FL**2 * (self.in_pressure + ATMOSPHERIC_PRESSURE - self.valve.critical_pressure_ratio * self.vapor_pressure)
+        allowable_pressure_differential = CAVITATION_SAFETY_FACTOR * allowable_pressure_differential
+        allowable_pressure_differential = max(allowable_pressure_differential, 0.0)
+        return(allowable_pressure_differential)
+
+    def calculate_in_velocity(self):
+        if self.flow is None or self.diameter is None:
+            return(None)
+        
+        ratio = self.diameter / 2
+        area = PI * ratio**2
+        velocity = self.flow / (3.12 * area)
+        return(velocity)
+
+    def calculate_noise(self):
+        if self.Cv is None or self.diameter is None or self.in_pressure is None or self.pressure_differential is None or self.allowable_pressure_differential is None:
+            return(None)
+        if self.vapor_pressure is None or not is_noise_available():
+            return(None)
+        
+        is_cavitating = self.pressure_differential > self.allowable_pressure_differential
+        noise = predict_noise_at_point(self.Cv, self.diameter, self.in_pressure, self.pressure_differential, self.vapor_pressure, is_cavitating)
+        if noise != noise: #Outside the charts
+            return(None)
+        return(noise)
+
+    def calculate_outputs(self):
+        timer = get_stage_timer('Dimensionamiento') #None unless timing is enabled
+        self.Reynolds_number = self.calculate_Reynolds_number()
+        if timer:
+            timer.lap('Reynolds_number')
+        self.correction_factor = self.get_Reynolds_correction_factor()
+        if timer:
+            timer.lap('correction_factor')
+        self.Cv = self.calculate_Cv()
+
+        if self.Cv is not None and self.correction_factor is not None:
+            self.Cv = self.Cv * self.correction_factor
+        if timer:
+            timer.lap('Cv')
+
+        self.opening = self.calculate_opening()
+        if timer:
+            timer.lap('opening')
+        self.FL = self.get_FL()
+        if timer:
+            timer.lap('FL')
+        self.allowable_pressure_differential = self.calculate_allowable_pressure_differential_without_cavitation()
+        if timer:
+            timer.lap('allowable_pressure_differential')
+        self.velocity = self.calculate_in_velocity()
+        if timer:
+            timer.lap('velocity')
+        self.noise = self.calculate_noise()
+        if timer:
+            timer.lap('noise')
+    
+    def set_flags(self):
+        timer = get_stage_timer('Dimensionamiento')
+
+        if self.opening is not None:
+            self.opening_too_big = False
+            self.opening_too_small = False
+            if self.opening < 20: #Agregar rangos
+                self.opening_too_small = True
+            if self.opening > self.valve.max_opening:
+                self.opening_too_big = True
+
+        if self.pressure_differential is not None and self.allowable_pressure_differential is not None:
+            self.is_cavitating = False
+            if self.pressure_differential > self.allowable_pressure_differential:
+                self.is_cavitating = True
+        
+        if self.velocity is not None and self.valve is not None:
+            self.is_eroding = False
+            if self.velocity > self.valve.max_velocity_without_erosion:
+                self.is_eroding = True
+        
+        self.is_flashing = False #Temporal
+        self.is_noisy = False
+        if self.noise is not None and self.noise > MAX_NOISE_LEVEL:
+            self.is_noisy = True
+        if timer:
+            timer.lap('set_flags')
+
+
+class DimensionamientoBatch: #Same math as Dimensionamiento, one valve/diameter and many operating points as arrays
+
+    def __init__(self, valve, diameter, flow, in_pressure, pressure_differential, specific_gravity, vapor_pressure, viscosity):
+        self.valve: Valve = valve
+        self.diameter = diameter
+        (self.flow,
+         self.in_pressure,
+         self.pressure_differential,
+         self.specific_gravity,
+         self.vapor_pressure,
+         self.viscosity) = np.broadcast_arrays(*[as_float_array(value) for value in [flow, in_pressure, pressure_differential, specific_gravity, vapor_pressure, viscosity]])
+
+        self.Reynolds_number = None
+        self.correction_factor = None
+        self.Cv = None
+        self.opening = None
+        self.FL = None
+        self.allowable_pressure_differential = None
+        self.velocity = None
+        self.noise = None
+
+        self.is_cavitating = None
+        self.is_flashing = None
+        self.is_eroding = None
+        self.opening_too_small = None
+        self.opening_too_big = None
+        self.is_noisy = None
+
+    def __len__(self):
+        return(self.flow.size)
+
+    def __repr__(self):
+        return(f'DimensionamientoBatch({self.valve}, {self.diameter}, {len(self)} points)')
+
+    def calculate_Reynolds_number(self):
+        Reynolds_number = calculate_Reynolds_numbers(self.valve, self.diameter, self.flow, self.viscosity)
+        return(Reynolds_number)
+
+    def get_Reynolds_correction_factor(self):
+        return(get_Reynolds_correction_factors(self.Reynolds_number))
+
+    def calculate_Cv(self):
+        Cv = self.flow * (self.specific_gravity / self.pressure_differential)**(1/2)
+        return(Cv)
+
+    def calculate_opening(self):
+        opening_at_Cv = self.valve.opening_at_Cv[self.diameter]
+        max_Cv = opening_at_Cv.x[-1]
+
+        opening = opening_at_Cv.evaluate_array(self.Cv)
+        opening = np.where(self.Cv > max_Cv, self.valve.max_opening + 1, opening)
+        return(opening)
+
+    def get_FL(self):
+        FL = self.valve.FL_at_opening.evaluate_array(self.opening)
+        FL = np.where((self.opening > self.valve.max_opening) | (self.opening < 10), np.nan, FL)
+        return(FL)
+
+    def calculate_allowable_pressure_differential_without_cavitation(self):
+        allowable_pressure_differential = self.FL**2 * (self.in_pressure + ATMOSPHERIC_PRESSURE - self.valve.critical_pressure_ratio * self.vapor_pressure)
+        allowable_pressure_differential = CAVITATION_SAFETY_FACTOR * allowable_pressure_differential
+        allowable_pressure_differential = np.maximum(allowable_pressure_differential, 0.0) #NaN stays NaN
+        return(allowable_pressure_differential)
+
+    def calculate_in_velocity(self):
+        ratio = self.diameter / 2
+        area = PI * ratio**2
+        velocity = self.flow / (3.12 * area)
+        return(velocity)
+
+    def calculate_noise(self): #NaN where the allowable pressure differential is unknown, since cavitation changes factor C
+        is_cavitating = self.pressure_differential > self.allowable_pressure_differential
+        noise = predict_noise(self.Cv, self.diameter, self.in_pressure, self.pressure_differential, self.vapor_pressure, is_cavitating)
+        noise = np.where(np.isnan(self.allowable_pressure_differential), np.nan, noise)
+        return(noise)
+
+    def calculate_outputs(self):
+        timer = get_stage_timer('DimensionamientoBatch')
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            self.Reynolds_number = self.calculate_Reynolds_number()
+            if timer:
+                timer.lap('Reynolds_number')
+            self.correction_factor = self.get_Reynolds_correction_factor()
+            if timer:
+                timer.lap('correction_factor')
+            self.Cv = self.calculate_Cv()
+            self.Cv = self.Cv * np.where(np.isnan(self.correction_factor), 1.0, self.correction_factor) #Uncorrected without viscosity, like Dimensionamiento
+            if timer:
+                timer.lap('Cv')
+
+            self.opening = self.calculate_opening()
+            if timer:
+                timer.lap('opening')
+            self.FL = self.get_FL()
+            if timer:
+                timer.lap('FL')
+            self.allowable_pressure_differential = self.calculate_allowable_pressure_differential_without_cavitation()
+            if timer:
+                timer.lap('allowable_pressure_differential')
+            self.velocity = self.calculate_in_velocity()
+            if timer:
+                timer.lap('velocity')
+            self.noise = self.calculate_noise()
+            if timer:
+                timer.lap('noise')
+
+    def set_flags(self): #Missing outputs (NaN) never raise a flag
+        timer = get_stage_timer('DimensionamientoBatch')
+
+        self.opening_too_small = self.opening < 20
+        self.opening_too_big = self.opening > self.valve.max_opening
+        self.is_cavitating = self.pressure_differential > self.allowable_pressure_differential
+        self.is_eroding = self.velocity > self.valve.max_velocity_without_erosion
+
+        self.is_flashing = np.zeros(self.flow.shape, dtype = bool) #Temporal
+        self.is_noisy = self.noise > MAX_NOISE_LEVEL
+        if timer:
+            timer.lap('set_flags')
+
+
+def get_Reynolds_correction_factors(Reynolds_number): #Array version of Dimensionamiento.get_Reynolds_correction_factor, NaN stays NaN
+    correction_factor = load_Reynolds_correction_interpolator().evaluate_array(Reynolds_number)
+    correction_factor = np.where(Reynolds_number > 4999.9, 1.0, correction_factor)
+    correction_factor = np.where(Reynolds_number < 0.011, 240.0, correction_factor)
+    return(correction_factor)
+
+def calculate_Reynolds_numbers(valve: Valve, diameter, flow, viscosity): #The definition the Reynolds correction table is indexed by, scalars or arrays.
+    #It does not depend on Cv, so one table lookup gives the corrected Cv directly
+    Reynolds_number = 3160 * flow / (diameter * viscosity) * valve.Reynolds_factor
+    return(Reynolds_number)
+
+def as_float_array(value): #None becomes NaN
+    if value is None:
+        return(np.array(np.nan))
+    return(np.array(value, dtype = float))
+
+def get_dimensionable_and_available_diameters(valve: Valve):
+    available_diameters = valve.available_diameters
+    dimensionable_diameters = list(valve.diameter_rows)
+    diameters = []
+    for diameter in available_diameters:
+        if diameter in dimensionable_diameters:
+            diameter = int(diameter) #Will fail for half diameters
+            diameters.append(diameter)
+    return(diameters)
+
+def get_fluid_properties(fluid: Fluid, temperature): #Same interpolation as callbacks.fill_fluid_values, temperature in °C as scalar or array
+    temperature = as_float_array(temperature)
+    properties = {}
+    for attribute_name in FLUID_PROPERTIES:
+        if attribute_name not in fluid.at_temperature:
+            properties[attribute_name] = np.full(temperature.shape, np.nan)
+            continue
+        properties[attribute_name] = fluid.at_temperature[attribute_name].evaluate_array(temperature)
+    return(properties)
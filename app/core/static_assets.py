@@ -0,0 +1,87 @@
+
+#encoding: utf-8
+
+#Static artifacts computed once instead of on every cold start: the logo as base64 and the unit conversion table,
+#so a new replica needs neither PIL nor pint to serve its first page. Stored in one JSON file, rebuilt when a source changes.
+#Build it ahead of time (e.g. in the image, next to the compiled catalog) with: python -m core.static_assets
+
+import os
+import hashlib
+import tempfile
+import orjson
+from functools import lru_cache
+from core.constants import DATA_PATH, IMG_PATH, STATIC_ASSETS_PATH, UNITS_AS_STRING, BASE_UNITS
+
+STATIC_ASSETS_FORMAT_VERSION = 1 #Bump when the contents of the file change
+LOGO_PATH = IMG_PATH / 'Orbinox_logo.png'
+SOURCE_PATHS = [LOGO_PATH, DATA_PATH / 'pint_extra_units.txt']
+
+
+def get_source_fingerprint(): #Sizes and mtimes of the files plus the units offered, so checking it never opens an image or pint
+    fingerprint = hashlib.sha256()
+    for path in SOURCE_PATHS:
+        stat = path.stat()
+        fingerprint.update(f'{path.name}|{stat.st_size}|{stat.st_mtime_ns}\n'.encode('utf-8'))
+    fingerprint.update(repr((UNITS_AS_STRING, BASE_UNITS)).encode('utf-8'))
+    return(fingerprint.hexdigest())
+
+def encode_logo(): #Re-encoded through PIL like the page always did, so the served bytes do not change
+    from base64 import b64encode
+    from io import BytesIO
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.open(LOGO_PATH).save(buffer, format = 'PNG')
+    return(b64encode(buffer.getvalue()).decode())
+
+def build_static_assets(fingerprint = None):
+    from core.units import compute_conversion_table
+
+    if fingerprint is None:
+        fingerprint = get_source_fingerprint()
+    return({'format_version': STATIC_ASSETS_FORMAT_VERSION,
+            'fingerprint': fingerprint,
+            'logo': encode_logo(),
+            'conversion_table': [[unit, base_unit, scale, offset] for (unit, base_unit), (scale, offset) in compute_conversion_table().items()]})
+
+def write_static_assets(assets, path = STATIC_ASSETS_PATH):
+    file_descriptor, temporary_path = tempfile.mkstemp(dir = path.parent, prefix = path.stem, suffix = '.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            file.write(orjson.dumps(assets)) #Floats are written shortest round-trip, the table reads back bit for bit
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, path) #Atomic, concurrent replicas never read a half-written file
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+def read_static_assets(path = STATIC_ASSETS_PATH): #None if missing, from another format version or older than its sources
+    try:
+        assets = orjson.loads(path.read_bytes())
+        is_valid = assets['format_version'] == STATIC_ASSETS_FORMAT_VERSION and assets['fingerprint'] == get_source_fingerprint()
+    except (OSError, KeyError, TypeError, orjson.JSONDecodeError):
+        return(None)
+    if not is_valid:
+        return(None)
+    return(assets)
+
+def compile_static_assets():
+    fingerprint = get_source_fingerprint() #Taken before building, an edit during the build triggers another rebuild
+    assets = build_static_assets(fingerprint)
+    write_static_assets(assets)
+    return(assets)
+
+@lru_cache(maxsize = 1)
+def load_static_assets(): #Precomputed assets if they are up to date, otherwise they are rebuilt first
+    assets = read_static_assets()
+    if assets is not None:
+        return(assets)
+    try:
+        return(compile_static_assets())
+    except OSError: #Read-only data folder, built in memory on every start
+        return(build_static_assets())
+
+
+if __name__ == '__main__':
+    compile_static_assets()
+    print(f'Static assets built into {STATIC_ASSETS_PATH}')
@@ -0,0 +1,134 @@
+
+#encoding: utf-8
+
+#Opt-in stage timings aggregated into histograms, for finding the slow phase of a page run without a profiler.
+#Enable with DIMENSIONAMIENTO_TIMING=1. Histograms are written to DIMENSIONAMIENTO_TIMING_FILE if it is set, otherwise logged.
+
+import atexit
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+TIMING_ENV_VAR = 'DIMENSIONAMIENTO_TIMING'
+TIMING_FILE_ENV_VAR = 'DIMENSIONAMIENTO_TIMING_FILE'
+DUMP_INTERVAL = 60 #Seconds between two dumps from maybe_dump_timings
+BUCKET_BOUNDS = [1e-6 * 2**exponent for exponent in range(25)] #1 us to ~17 s, seconds
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram: #Durations of one stage, log-spaced buckets so it stays a fixed size
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1) #Last bucket is everything above BUCKET_BOUNDS[-1]
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, duration):
+        self.counts[bisect_left(BUCKET_BOUNDS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+
+    def percentile(self, percent): #Upper bound of the bucket holding it, within a factor of 2
+        if self.count == 0:
+            return(float('nan'))
+        rank = percent / 100 * self.count
+        accumulated = 0
+        for bound, count in zip(BUCKET_BOUNDS, self.counts):
+            accumulated += count
+            if accumulated >= rank:
+                return(min(bound, self.max))
+        return(self.max)
+
+    def summary(self):
+        return({'count': self.count,
+                'mean': self.total / self.count if self.count else float('nan'),
+                'min': self.min if self.count else float('nan'),
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'max': self.max if self.count else float('nan')})
+
+class TimingRegistry: #stage name -> Histogram, shared by every thread of the process
+
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.histograms: dict[str, Histogram] = {}
+        self.lock = threading.Lock()
+        self.last_dump = time.monotonic()
+
+    def record(self, stage, duration):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.add(duration)
+
+    def summaries(self):
+        with self.lock:
+            return({stage: histogram.summary() for stage, histogram in sorted(self.histograms.items())})
+
+    def to_text(self): #Prometheus text format, readable as is and scrapable by a node exporter textfile collector
+        lines = ['# TYPE dimensionamiento_stage_seconds histogram']
+        with self.lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                accumulated = 0
+                for bound, count in zip(BUCKET_BOUNDS, histogram.counts):
+                    accumulated += count
+                    lines.append(f'dimensionamiento_stage_seconds_bucket{{stage="{stage}",le="{bound:.6g}"}} {accumulated}')
+                lines.append(f'dimensionamiento_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'dimensionamiento_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.9f}')
+                lines.append(f'dimensionamiento_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return('\n'.join(lines) + '\n')
+
+    def dump(self, path = None):
+        path = path or os.environ.get(TIMING_FILE_ENV_VAR)
+        self.last_dump = time.monotonic()
+        if not path:
+            for stage, summary in self.summaries().items():
+                logger.info('%s: %s', stage, ', '.join(f'{name} {value:.3g}' for name, value in summary.items()))
+            return()
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w', encoding = 'utf-8') as file:
+            file.write(self.to_text())
+        os.replace(temporary_path, path) #Readers never see a half-written file
+
+class StageTimer: #Each lap records the time since the previous one under f'{prefix}.{stage}'
+
+    __slots__ = ('registry', 'prefix', 'last')
+
+    def __init__(self, registry: TimingRegistry, prefix):
+        self.registry = registry
+        self.prefix = prefix
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.registry.record(f'{self.prefix}.{stage}', now - self.last)
+        self.last = time.perf_counter() #Recording itself is not charged to the next stage
+
+
+TIMINGS = TimingRegistry(enabled = os.environ.get(TIMING_ENV_VAR, '') not in ['', '0'])
+
+def enable_timing(enabled = True):
+    TIMINGS.enabled = enabled
+
+def get_stage_timer(prefix): #None while timing is disabled, callers check it before each lap
+    if not TIMINGS.enabled:
+        return(None)
+    return(StageTimer(TIMINGS, prefix))
+
+def maybe_dump_timings(): #Cheap to call on every page run, dumps at most every DUMP_INTERVAL seconds
+    if TIMINGS.enabled and time.monotonic() - TIMINGS.last_dump >= DUMP_INTERVAL:
+        TIMINGS.dump()
+
+@atexit.register
+def dump_timings_at_exit():
+    if TIMINGS.enabled and TIMINGS.histograms:
+        TIMINGS.dump()
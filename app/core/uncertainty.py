@@ -0,0 +1,147 @@
+
+#encoding: utf-8
+
+#Monte Carlo uncertainty of a sizing: inputs are sampled from distributions and pushed through DimensionamientoBatch chunk by chunk.
+#Memory does not grow with the number of samples, percentiles come from fixed-size histograms.
+
+import numpy as np
+from core.catalog import Valve, Fluid
+from core.sizing import DimensionamientoBatch, get_fluid_properties
+from core.noise import is_noise_available
+
+DEFAULT_SAMPLES = 1000000
+DEFAULT_CHUNK_SIZE = 100000
+DEFAULT_PERCENTILES = [1, 5, 50, 95, 99]
+HISTOGRAM_BINS = 8192 #Percentiles are linear inside a bin, error below one bin width
+UNCERTAIN_INPUTS = ['flow', 'in_pressure', 'out_pressure', 'temperature'] #Base units: GPM, PSI, PSI, °C
+OUTPUTS = ['opening', 'velocity', 'allowable_pressure_differential'] #opening is max_opening + 1 above the Cv table, like in the app
+FLAGS = ['opening_too_big', 'opening_too_small', 'is_cavitating', 'is_eroding', 'is_noisy'] #is_noisy only with data/noise
+
+
+class InputDistribution: #One uncertain input, parameters in the unit the samples are drawn in
+
+    KINDS = {'fixed': 1, 'normal': 2, 'uniform': 2, 'triangular': 3} #kind -> number of parameters
+
+    def __init__(self, kind, *parameters):
+        if kind not in self.KINDS:
+            raise ValueError(f'unknown distribution {kind}, expected one of {", ".join(self.KINDS)}')
+        if len(parameters) != self.KINDS[kind]:
+            raise ValueError(f'{kind} takes {self.KINDS[kind]} parameters, got {len(parameters)}')
+        self.kind = kind
+        self.parameters = tuple(float(parameter) for parameter in parameters)
+
+    def __repr__(self):
+        return(f'{self.kind}({", ".join(f"{parameter:g}" for parameter in self.parameters)})')
+
+    @classmethod
+    def from_string(cls, text): #'normal:500,25' (mean, std), 'uniform:40,45' (low, high), 'triangular:15,20,30' (low, mode, high), or a plain number
+        kind, _, parameters = text.partition(':')
+        if not parameters:
+            return(cls('fixed', kind))
+        return(cls(kind.strip(), *parameters.split(',')))
+
+    def converted(self, scale, offset): #Same distribution in another unit, value * scale + offset
+        if self.kind == 'normal':
+            mean, standard_deviation = self.parameters
+            return(InputDistribution('normal', mean * scale + offset, standard_deviation * abs(scale)))
+        return(InputDistribution(self.kind, *[parameter * scale + offset for parameter in self.parameters]))
+
+    def sample(self, rng: np.random.Generator, size):
+        if self.kind == 'fixed':
+            return(np.full(size, self.parameters[0]))
+        if self.kind == 'normal':
+            return(rng.normal(*self.parameters, size = size))
+        if self.kind == 'uniform':
+            return(rng.uniform(*self.parameters, size = size))
+        return(rng.triangular(*self.parameters, size = size))
+
+class StreamingHistogram: #Approximate percentiles of a stream of values, range taken from the first chunk and doubled when a value falls outside
+
+    def __init__(self, bins = HISTOGRAM_BINS):
+        self.bins = bins #Even, so doubling the range merges bins in pairs
+        self.low = None
+        self.span = None
+        self.counts = np.zeros(bins, dtype = np.int64)
+        self.count = 0
+        self.missing = 0 #NaN values
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def grow(self, to_the_right): #Same bins over twice the range, exact since every new bin is two old ones
+        merged = self.counts.reshape(-1, 2).sum(axis = 1)
+        empty = np.zeros(self.bins // 2, dtype = np.int64)
+        if to_the_right:
+            self.counts = np.concatenate([merged, empty])
+        else:
+            self.counts = np.concatenate([empty, merged])
+            self.low -= self.span
+        self.span *= 2
+
+    def add(self, values):
+        finite = values[np.isfinite(values)]
+        self.missing += values.size - finite.size
+        if finite.size == 0:
+            return()
+        low, high = float(finite.min()), float(finite.max())
+        if self.low is None: #Half the span of the first chunk is left free on each side
+            margin = (high - low) / 2 or max(abs(low), 1.0) * 1e-3
+            self.low = low - margin
+            self.span = high - low + 2 * margin
+        while high >= self.low + self.span:
+            self.grow(to_the_right = True)
+        while low < self.low:
+            self.grow(to_the_right = False)
+
+        indices = ((finite - self.low) * (self.bins / self.span)).astype(np.int64)
+        self.counts += np.bincount(np.minimum(indices, self.bins - 1), minlength = self.bins)
+        self.count += finite.size
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def percentile(self, percent): #Over the finite values only
+        if self.count == 0:
+            return(float('nan'))
+        cumulative = np.cumsum(self.counts)
+        rank = percent / 100 * self.count
+        index = min(int(np.searchsorted(cumulative, rank, side = 'left')), self.bins - 1)
+        before = cumulative[index - 1] if index > 0 else 0
+        weight = (rank - before) / self.counts[index] if self.counts[index] else 0.0
+        value = self.low + (index + weight) * self.span / self.bins
+        return(min(max(float(value), self.min), self.max))
+
+
+def sample_inputs(distributions: dict, fluid: Fluid, rng: np.random.Generator, size): #Sizing inputs in base units, fluid properties follow the sampled temperature
+    samples = {name: distributions[name].sample(rng, size) for name in UNCERTAIN_INPUTS}
+    samples['pressure_differential'] = samples['in_pressure'] - samples['out_pressure']
+    samples.update(get_fluid_properties(fluid, samples['temperature']))
+    return(samples)
+
+def run_monte_carlo(valve: Valve, diameter, fluid: Fluid, distributions: dict, samples = DEFAULT_SAMPLES, chunk_size = DEFAULT_CHUNK_SIZE,
+                    percentiles = DEFAULT_PERCENTILES, seed = None):
+    #distributions: InputDistribution per name in UNCERTAIN_INPUTS, in base units
+    rng = np.random.default_rng(seed)
+    histograms = {output: StreamingHistogram() for output in OUTPUTS}
+    flags = FLAGS if is_noise_available() else [flag for flag in FLAGS if flag != 'is_noisy'] #A probability of 0 would claim it was checked
+    flag_counts = dict.fromkeys(flags, 0)
+    invalid = 0
+
+    for start in range(0, samples, chunk_size):
+        size = min(chunk_size, samples - start)
+        inputs = sample_inputs(distributions, fluid, rng, size)
+        valid = (inputs['flow'] > 0) & (inputs['pressure_differential'] > 0) #Reverse flow or P2 >= P1 cannot be sized
+        invalid += size - int(np.count_nonzero(valid))
+
+        dimens = DimensionamientoBatch(valve, diameter, inputs['flow'], inputs['in_pressure'], np.where(valid, inputs['pressure_differential'], np.nan),
+                                       inputs['specific_gravity'], inputs['vapor_pressure'], inputs['viscosity'])
+        dimens.calculate_outputs()
+        dimens.set_flags()
+        for output in OUTPUTS:
+            histograms[output].add(np.where(valid, getattr(dimens, output), np.nan))
+        for flag in flags:
+            flag_counts[flag] += int(np.count_nonzero(getattr(dimens, flag) & valid))
+
+    return({'samples': samples,
+            'invalid_probability': invalid / samples if samples else float('nan'),
+            'percentiles': {output: {percent: histograms[output].percentile(percent) for percent in percentiles} for output in OUTPUTS},
+            'undefined_probability': {output: histograms[output].missing / samples if samples else float('nan') for output in OUTPUTS}, #NaN outputs, invalid samples included
+            'flag_probabilities': {flag: count / samples if samples else float('nan') for flag, count in flag_counts.items()}})
@@ -0,0 +1,61 @@
+
+#encoding: utf-8
+
+from functools import lru_cache
+from core.constants import DATA_PATH, UNITS_AS_STRING, BASE_UNITS
+
+
+@lru_cache(maxsize = 1)
+def get_ureg():
+    import pint #Imported here, building the registry is the slow part of startup
+
+    ureg = pint.UnitRegistry()
+    ureg.load_definitions(DATA_PATH / 'pint_extra_units.txt')
+    ureg.formatter.default_format = 'P'
+    return(ureg)
+
+@lru_cache(maxsize = None)
+def get_scale_and_offset(unit, base_unit): #value_in_base_unit = value * scale + offset. pint is only used here, once per pair of units
+    if unit == base_unit:
+        return((1.0, 0.0))
+    ureg = get_ureg()
+    offset = float(ureg.Quantity(0.0, unit).to(base_unit).magnitude)
+    scale = (float(ureg.Quantity(1000.0, unit).to(base_unit).magnitude) - offset) / 1000 #Wide span keeps °F exact to ~1e-15
+    return((scale, offset))
+
+def compute_conversion_table(): #(unit, base_unit) -> (scale, offset) for every unit the app offers, through pint
+    table = {}
+    for quantity_name, units in UNITS_AS_STRING.items():
+        base_unit = BASE_UNITS[quantity_name]
+        for unit in units:
+            table[(unit, base_unit)] = get_scale_and_offset(unit, base_unit)
+    return(table)
+
+@lru_cache(maxsize = 1)
+def get_conversion_table(): #Same table read from the static assets, pint is not even imported unless they must be rebuilt
+    from core.static_assets import load_static_assets
+
+    return({(unit, base_unit): (scale, offset) for unit, base_unit, scale, offset in load_static_assets()['conversion_table']})
+
+def get_scale_and_offset_from_table(unit, base_unit): #Plain dict lookup, units outside UNITS_AS_STRING still work through pint
+    scale_and_offset = get_conversion_table().get((unit, base_unit))
+    if scale_and_offset is None:
+        scale_and_offset = get_scale_and_offset(unit, base_unit)
+    return(scale_and_offset)
+
+def to_base_unit(value, quantity_name, unit): #Float or NumPy array, None stays None
+    if value is None:
+        return(None)
+    scale, offset = get_scale_and_offset_from_table(unit, BASE_UNITS[quantity_name])
+    return(value * scale + offset)
+
+def from_base_unit(value, quantity_name, unit):
+    if value is None:
+        return(None)
+    scale, offset = get_scale_and_offset_from_table(unit, BASE_UNITS[quantity_name])
+    return((value - offset) / scale)
+
+def convert(value, quantity_name, from_unit, to_unit):
+    if from_unit == to_unit:
+        return(value)
+    return(from_base_unit(to_base_unit(value, quantity_name, from_unit), quantity_name, to_unit))
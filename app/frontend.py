@@ -2,13 +2,13 @@
 #encoding: utf-8
 
 import streamlit as st
-import pint ##?
-import plotly.graph_objects as go
 import backend
 import callbacks
-from unit_registry import ureg ###
-from constants import DEFAULTS, IMAGES
+from core.timing import get_stage_timer, maybe_dump_timings
+from core.noise import is_noise_available
+from constants import IMAGES, MAX_NOISE_LEVEL
 from load_data import VALVES, FLUIDS
+from plots import get_opening_vs_Cv_figure
 from user_inputs import generate_valve_and_fluid_dropdowns, generate_multiple_inputs, generate_diameter_input_line
 
 LOGO_WIDTH = 200
@@ -200,16 +200,21 @@ def write_flags_text(flags: list[str]):
     flag_text = {'opening_too_big': 'La válvula es demasiado pequeña para alcanzar ese caudal con esas condiciones de trabajo.', 
                  'opening_too_small': 'La válvula trabaja con un ángulo o porcentaje de abertura menor a 20%. Para durabilidad y seguridad se recomienda trabajo entre 20% y 80%.', 
                  'is_cavitating': 'La diferencia de presión es demasiado grande para las condiciones de trabajo, el fluido cavita', 
-                 'is_eroding': 'La velocidad del fluido genera erosión en la válvula'}
+                 'is_eroding': 'La velocidad del fluido genera erosión en la válvula', 
+                 'is_noisy': f'El ruido estimado supera {MAX_NOISE_LEVEL} dB(A)'}
     for flag in flags:
         st.write(f'-{flag_text[flag]}')
 
 def write_all_flags_text(dimensionamientos: list[backend.Dimensionamiento]):
 
+    conditions = ['opening_too_big', 'opening_too_small', 'is_cavitating', 'is_eroding']
+    if is_noise_available(): #Inert without data/noise
+        conditions.append('is_noisy')
+
     all_flags = {}
     for index in range(3):
         all_flags[index] = []
-        for condition in ['opening_too_big', 'opening_too_small', 'is_cavitating', 'is_eroding']:
+        for condition in conditions:
             dimensionamiento = dimensionamientos[index]
             if getattr(dimensionamiento, condition):
                 all_flags[index].append(condition)
@@ -227,9 +232,6 @@ def plot_opening_vs_flow(dimensionamientos: list[backend.Dimensionamiento]):
     if valve is None or diameter is None:
         return()
 
-    openings = list(valve.Cv.columns)
-    Cvs = list(valve.Cv.loc[diameter])
-
     extra_openings = []
     extra_Cvs = []
 
@@ -240,28 +242,29 @@ def plot_opening_vs_flow(dimensionamientos: list[backend.Dimensionamiento]):
             if 10 < extra_opening <= valve.max_opening:
                 extra_openings.append(round(extra_opening, 1))
                 extra_Cvs.append(round(extra_Cv))
-    
-    openings = sorted(openings + extra_openings)
-    Cvs = sorted(Cvs + extra_Cvs)
-
-    plot = go.Figure()
-    plot.update_layout(xaxis_title = 'Apertura de la válvula (%)', yaxis_title = 'Cv')
-    plot.add_trace(go.Scatter(x = openings, y = Cvs, mode = 'lines+markers'))
-
-    for x in extra_openings:
-        plot.add_vline(x = x, 
-                       line = {'color': 'lightgray', 'width': 2}, 
-                       layer = 'below')
 
+    plot = get_opening_vs_Cv_figure(valve, diameter, extra_openings, extra_Cvs)
     st.plotly_chart(plot)#, theme = None)
 
+@st.fragment #Changing an output unit only reruns this section, new inputs rerun the whole page
+def generate_output_section(dimensionamientos: list[backend.Dimensionamiento]):
+    timer = get_stage_timer('page')
+    st.subheader('Dimensionamiento')
+    generate_all_output_fields(dimensionamientos)
+    if timer:
+        timer.lap('outputs')
+    plot_opening_vs_flow(dimensionamientos)
+    if timer:
+        timer.lap('plot')
+
 
 
 #-------------------------------------------------------------------------------------------------
 
 
 
-backend.init_session_state(DEFAULTS)
+timer = get_stage_timer('page') #None unless DIMENSIONAMIENTO_TIMING is set
+
 
 st.set_page_config(layout = 'wide')
 
@@ -272,25 +275,32 @@ input_column, separator_column, output_column = st.columns([19.5, 1, 19.5])
 with separator_column:
     vertical_divider(height = 920)
 
+if timer:
+    timer.lap('header')
+
 with input_column:
     st.subheader('Condiciones de trabajo')
     inputs = generate_all_input_fields()
+    if timer:
+        timer.lap('inputs')
     inputs = backend.process_inputs(inputs)
+    if timer:
+        timer.lap('process_inputs')
     dimensionamientos = backend.get_dimensionamientos_from_triple_inputs(inputs)
+    if timer:
+        timer.lap('sizing')
 
 with output_column:
-    st.subheader('Dimensionamiento')
-    generate_all_output_fields(dimensionamientos)
-    plot_opening_vs_flow(dimensionamientos)
+    generate_output_section(dimensionamientos)
+    if timer:
+        timer.lap('output_section') #outputs + plot
 
 with input_column:
     write_all_flags_text(dimensionamientos)
+    if timer:
+        timer.lap('warnings')
 
-
-
-if st.session_state['rerun']:
-    st.session_state['rerun'] = False
-    st.rerun()
+maybe_dump_timings()
 
 
 
@@ -0,0 +1,299 @@
+
+#encoding: utf-8
+
+#Drives N simulated engineers at once against a real `streamlit run frontend.py` server, each one a websocket session
+#sending the same messages the browser sends, and reports rerun latency percentiles, throughput and the server's peak RSS.
+#Usage: python app/load_test.py --users 20 [--sessions-per-user 3] [--think-time 0.5] [--seed 0] [--output load.json]
+#        python app/load_test.py --url http://host:8501 --server-pid 1234   (an already running server, RSS only with its pid)
+#AppTest is not used because its runtime is global to the process: two sessions in threads break each other.
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+APP_PATH = Path(__file__).resolve().parent
+LOAD_TEST_FORMAT_VERSION = 2
+DEFAULT_PORT = 8599
+SERVER_START_TIMEOUT = 60 #Seconds
+STREAM_PATH = '/_stcore/stream'
+HEALTH_PATH = '/_stcore/health'
+WIDGET_TYPES = {'selectbox', 'number_input'} #The only widgets of the page
+
+
+class RerunError(Exception):
+    pass
+
+
+class SimulatedUser: #One browser tab following the usual sequence of a sizing
+
+    def __init__(self, user_id, url, seed, think_time, timeout):
+        self.user_id = user_id
+        self.url = url
+        self.random = random.Random(seed * 100003 + user_id) #Same steps on every run with the same seed
+        self.think_time = think_time
+        self.timeout = timeout
+        self.latencies: dict[str, list[float]] = {}
+        self.received_bytes = 0
+        self.errors = []
+        self.websocket = None
+        self.widgets = {} #key -> (widget id, element of that type, fragment id)
+        self.widget_states = {} #widget id -> WidgetState, the values the user has set, sent on every rerun like the browser does
+
+    async def rerun(self, fragment_id = ''): #Sends the widget states and reads the deltas until the script finishes
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.fragment_id = fragment_id
+        message.rerun_script.widget_states.widgets.extend(self.widget_states.values())
+        await self.websocket.send(message.SerializeToString())
+
+        widgets = dict(self.widgets) if fragment_id else {} #A fragment rerun only resends its own widgets
+        while True:
+            data = await self.websocket.recv()
+            self.received_bytes += len(data)
+            forward_message = ForwardMsg()
+            forward_message.ParseFromString(data)
+            kind = forward_message.WhichOneof('type')
+            if kind == 'delta' and forward_message.delta.WhichOneof('type') == 'new_element':
+                element = forward_message.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'exception':
+                    raise RerunError(f'{element.exception.type}: {element.exception.message}')
+                if element_type in WIDGET_TYPES:
+                    widget = getattr(element, element_type)
+                    widgets[widget.id.split('-', 2)[2]] = (widget.id, widget, forward_message.delta.fragment_id) #Ids are $$ID-<hash>-<key>
+            elif kind == 'script_finished':
+                if forward_message.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RerunError('compile error')
+                if forward_message.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+        self.widgets = widgets
+        present = {widget_id for widget_id, _, _ in widgets.values()}
+        self.widget_states = {widget_id: state for widget_id, state in self.widget_states.items() if widget_id in present} #Options changed, new id
+
+    def set_widget(self, key, value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        if key not in self.widgets:
+            raise RerunError(f'widget {key} not on the page')
+        widget_id, widget, fragment_id = self.widgets[key]
+        if widget.disabled:
+            raise RerunError(f'widget {key} is disabled')
+        state = WidgetState(id = widget_id)
+        if isinstance(value, str):
+            state.string_value = value #Selectboxes send the option as shown
+        else:
+            state.double_value = value
+        self.widget_states[widget_id] = state
+        return(fragment_id)
+
+    def choose(self, key, options = None): #Random option of a selectbox other than the current one, a browser does not rerun otherwise
+        widget_id, widget, _ = self.widgets[key]
+        current = self.widget_states[widget_id].string_value if widget_id in self.widget_states else None
+        choices = [option for option in (options or widget.options) if option != current and option in widget.options]
+        return(self.random.choice(choices or list(widget.options)))
+
+    async def step(self, name, key = None, value = None):
+        start = time.perf_counter()
+        fragment_id = self.set_widget(key, value) if key is not None else ''
+        await asyncio.wait_for(self.rerun(fragment_id), self.timeout)
+        self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+        if self.think_time:
+            await asyncio.sleep(self.random.uniform(0, 2 * self.think_time))
+
+    async def run_session(self):
+        import websockets
+
+        flows = sorted(self.random.uniform(50, 800) for _ in range(3))
+        in_pressure = self.random.uniform(20, 80)
+        async with websockets.connect(self.url, subprotocols = ['streamlit'], max_size = None) as self.websocket:
+            self.widgets = {}
+            self.widget_states = {}
+            await self.step('open_page')
+            await self.step('select_valve', 'Válvula', self.choose('Válvula'))
+            await self.step('select_diameter', 'Diámetro', self.choose('Diámetro'))
+            await self.step('select_fluid', 'Fluido', 'Agua')
+            await self.step('set_temperature', 'Temperatura 0', round(self.random.uniform(5, 80), 1))
+            await self.step('set_flow_unit', 'Caudal unidad', self.choose('Caudal unidad'))
+            for index in range(3):
+                await self.step('set_flow', f'Caudal {index}', float(round(flows[index])))
+                await self.step('set_in_pressure', f'Presión de entrada {index}', round(in_pressure, 1))
+                await self.step('set_pressure_differential', f'Diferencia de presión {index}', round(self.random.uniform(2, in_pressure / 2), 1))
+            await self.step('switch_pressure_unit', 'Presión de entrada unidad', self.choose('Presión de entrada unidad'))
+            await self.step('switch_temperature_unit', 'Temperatura unidad', self.choose('Temperatura unidad'))
+            await self.step('switch_output_unit', 'Velocidad del fluido unidad', self.choose('Velocidad del fluido unidad')) #Fragment rerun
+
+    async def run(self, sessions):
+        for _ in range(sessions):
+            try:
+                await self.run_session()
+            except Exception as error: #Widget missing, timeout, connection closed... the other users keep going
+                self.errors.append(f'session: {error!r}')
+
+
+class RSSSampler(threading.Thread): #RSS of the server process every interval, while the users run
+
+    def __init__(self, pid, interval = 0.1):
+        super().__init__(daemon = True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.samples.append(get_process_memory(self.pid)['VmRSS'])
+
+def get_process_memory(pid): #Bytes of VmRSS and VmHWM (peak since start), Linux only; None elsewhere
+    memory = {'VmRSS': None, 'VmHWM': None}
+    try:
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                name, _, value = line.partition(':')
+                if name in memory:
+                    memory[name] = int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        pass
+    return(memory)
+
+def start_server(port): #Same command as production, on a free port, returns once it answers the health check
+    log = tempfile.TemporaryFile() #Not a pipe, a full pipe would block the server
+    server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', str(APP_PATH / 'frontend.py'),
+                               '--server.headless', 'true',
+                               '--server.port', str(port),
+                               '--server.fileWatcherType', 'none',
+                               '--browser.gatherUsageStats', 'false'],
+                              cwd = APP_PATH, stdout = subprocess.DEVNULL, stderr = log)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            log.seek(0)
+            sys.exit(f'streamlit exited with {server.returncode}: {log.read().decode(errors = "replace")}')
+        try:
+            with urllib.request.urlopen(f'http://localhost:{port}{HEALTH_PATH}', timeout = 1):
+                return(server)
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    sys.exit(f'streamlit did not answer on port {port} within {SERVER_START_TIMEOUT} s')
+
+def summarize(latencies): #Seconds
+    latencies = sorted(latencies)
+    if not latencies:
+        return({'count': 0})
+    if len(latencies) == 1:
+        percentiles = latencies * 99
+    else:
+        percentiles = statistics.quantiles(latencies, n = 100, method = 'inclusive')
+    return({'count': len(latencies),
+            'mean': statistics.fmean(latencies),
+            'p50': percentiles[49],
+            'p90': percentiles[89],
+            'p99': percentiles[98],
+            'max': latencies[-1]})
+
+async def run_users(simulated_users, sessions_per_user):
+    await asyncio.gather(*(user.run(sessions_per_user) for user in simulated_users))
+
+def run_load_test(url, server_pid, users, sessions_per_user = 1, think_time = 0.0, seed = 0, timeout = 60):
+    stream_url = url.replace('http', 'ws', 1).rstrip('/') + STREAM_PATH
+    simulated_users = [SimulatedUser(user_id, stream_url, seed, think_time, timeout) for user_id in range(users)]
+
+    rss_before = get_process_memory(server_pid)['VmRSS'] if server_pid else None
+    sampler = RSSSampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+    start = time.perf_counter()
+    asyncio.run(run_users(simulated_users, sessions_per_user))
+    elapsed = time.perf_counter() - start
+    if sampler:
+        sampler.stopped.set()
+        sampler.join()
+    memory_after = get_process_memory(server_pid) if server_pid else {'VmRSS': None, 'VmHWM': None}
+
+    by_step: dict[str, list[float]] = {}
+    for user in simulated_users:
+        for name, latencies in user.latencies.items():
+            by_step.setdefault(name, []).extend(latencies)
+    all_latencies = [latency for latencies in by_step.values() for latency in latencies]
+    rss_samples = [rss for rss in (sampler.samples if sampler else []) if rss is not None]
+    errors = [f'user {user.user_id} {error}' for user in simulated_users for error in user.errors]
+
+    return({'format_version': LOAD_TEST_FORMAT_VERSION,
+            'url': url,
+            'users': users,
+            'sessions_per_user': sessions_per_user,
+            'think_time': think_time,
+            'seed': seed,
+            'elapsed': elapsed,
+            'reruns': len(all_latencies),
+            'reruns_per_second': len(all_latencies) / elapsed if elapsed else float('nan'),
+            'bytes_per_rerun': sum(user.received_bytes for user in simulated_users) / len(all_latencies) if all_latencies else None,
+            'latency': summarize(all_latencies),
+            'latency_by_step': {name: summarize(latencies) for name, latencies in sorted(by_step.items())},
+            'rss_before': rss_before,
+            'peak_rss': max(rss_samples) if rss_samples else None,
+            'rss_after': memory_after['VmRSS'],
+            'max_rss_of_server': memory_after['VmHWM'],
+            'errors': errors[:50],
+            'error_count': len(errors)})
+
+def format_report(report):
+    latency = report['latency']
+    lines = [f'{report["users"]} users x {report["sessions_per_user"]} sessions, {report["reruns"]} reruns in {report["elapsed"]:.1f} s: {report["reruns_per_second"]:.1f} reruns/s']
+    if latency['count']:
+        lines.append(f'rerun latency p50 {latency["p50"] * 1e3:.0f} ms, p90 {latency["p90"] * 1e3:.0f} ms, p99 {latency["p99"] * 1e3:.0f} ms, max {latency["max"] * 1e3:.0f} ms, {report["bytes_per_rerun"] / 1024:.0f} KiB per rerun')
+    if report['peak_rss'] is not None:
+        lines.append(f'server RSS {report["rss_before"] / 2**20:.0f} MiB before, peak {report["peak_rss"] / 2**20:.0f} MiB, {report["rss_after"] / 2**20:.0f} MiB after')
+    for name, summary in report['latency_by_step'].items():
+        lines.append(f'  {name:<28}{summary["count"]:>6}{summary["p50"] * 1e3:>9.0f} ms{summary["p99"] * 1e3:>9.0f} ms')
+    if report['error_count']:
+        lines.append(f'{report["error_count"]} errors, first: {report["errors"][0]}')
+    return('\n'.join(lines))
+
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(description = 'Simulates concurrent users of the sizing page and reports rerun latency, throughput and peak RSS.')
+    parser.add_argument('--users', type = int, default = 10, help = 'concurrent simulated users, one websocket session each')
+    parser.add_argument('--sessions-per-user', type = int, default = 1, help = 'times each user goes through the whole sizing')
+    parser.add_argument('--think-time', type = float, default = 0.0, help = 'mean seconds between two interactions of a user, 0 for back to back')
+    parser.add_argument('--seed', type = int, default = 0, help = 'same seed, same valves and values')
+    parser.add_argument('--timeout', type = float, default = 60, help = 'seconds a single rerun may take before it counts as an error')
+    parser.add_argument('--url', help = 'already running server, by default one is started on --port')
+    parser.add_argument('--server-pid', type = int, help = 'pid of the --url server, to sample its RSS')
+    parser.add_argument('--port', type = int, default = DEFAULT_PORT, help = 'port of the server started by the load test')
+    parser.add_argument('--output', help = 'JSON file to write the full report to')
+    return(parser.parse_args(arguments))
+
+def main(arguments = None):
+    arguments = parse_arguments(arguments)
+    server = None
+    url, server_pid = arguments.url, arguments.server_pid
+    if url is None:
+        server = start_server(arguments.port)
+        url, server_pid = f'http://localhost:{arguments.port}', server.pid
+    try:
+        report = run_load_test(url, server_pid, arguments.users, arguments.sessions_per_user, arguments.think_time, arguments.seed, arguments.timeout)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print(format_report(report), file = sys.stderr)
+    if arguments.output:
+        Path(arguments.output).write_text(json.dumps(report, indent = 2) + '\n', encoding = 'utf-8')
+    if report['error_count']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
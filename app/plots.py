@@ -0,0 +1,40 @@
+
+#encoding: utf-8
+
+#Opening vs Cv plot. The curve and layout only depend on valve and diameter, so they are built and validated once and kept as JSON;
+#each rerun only adds the operating points.
+
+import orjson
+import plotly.graph_objects as go
+from functools import lru_cache
+from core.constants import CURVE_CACHE_SIZE
+from core.catalog import Valve, load_valves, get_catalog_version
+from core.curves import get_curve
+
+WEBGL_MIN_POINTS = 1000 #Longer traces are drawn with WebGL, same threshold plotly express uses
+VLINE_STYLE = {'color': 'lightgray', 'width': 2}
+
+
+@lru_cache(maxsize = CURVE_CACHE_SIZE)
+def load_static_figure_json(valve_name, diameter, catalog_version): #bytes, catalog_version only keys the cache
+    #The axes are % and Cv, which have no units, so the display units do not change it
+    curve = get_curve(load_valves()[valve_name], diameter)
+    trace_type = go.Scattergl if len(curve.openings) >= WEBGL_MIN_POINTS else go.Scatter
+    figure = go.Figure()
+    figure.update_layout(xaxis_title = 'Apertura de la válvula (%)', yaxis_title = 'Cv', showlegend = False)
+    figure.add_trace(trace_type(x = curve.openings, y = curve.Cvs, mode = 'lines'))
+    return(orjson.dumps(figure.to_dict(), option = orjson.OPT_SERIALIZE_NUMPY))
+
+def get_opening_vs_Cv_figure(valve: Valve, diameter, openings, Cvs): #New figure each call, safe to modify
+    figure_dict = orjson.loads(load_static_figure_json(valve.name, float(diameter), get_catalog_version()))
+    marker_type = 'scattergl' if len(openings) >= WEBGL_MIN_POINTS else 'scatter'
+    figure_dict['data'].append({'type': marker_type, 'x': openings, 'y': Cvs, 'mode': 'markers', 'marker': {'size': 10}}) #Operating points, on top of the curve
+    figure_dict['layout']['shapes'] = [{'type': 'line', 'x0': x, 'x1': x, 'xref': 'x', 'y0': 0, 'y1': 1, 'yref': 'y domain', 'line': dict(VLINE_STYLE), 'layer': 'below'}
+                                       for x in openings] #What add_vline builds
+    #The cached part was validated when it was built and the rest is plain literals. Validating again costs ~10 ms per rerun, and the
+    #documented routes (plotly.io.from_json, go.Figure(dict), passing the dict to st.plotly_chart) all validate, so this uses plotly's
+    #private _validate, pinned in requirements.txt. A plotly without it still gets a validated figure
+    try:
+        return(go.Figure(figure_dict, _validate = False))
+    except TypeError:
+        return(go.Figure(figure_dict))
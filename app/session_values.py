@@ -0,0 +1,73 @@
+
+#encoding: utf-8
+
+#Per-session values that are not widgets: last value of every input in base units and which inputs are disabled.
+#One small object per session instead of a dict of floats plus a session_state entry per flag. Widget values stay in
+#st.session_state, Streamlit keeps those itself.
+
+import streamlit as st
+from array import array
+
+NAN = float('nan')
+SESSION_VALUES_KEY = 'values'
+
+INPUT_KEYS = [f'{base_key} {index}' for base_key, number_of_inputs in [('Caudal', 3),
+                                                                        ('Presión de entrada', 3),
+                                                                        ('Presión de salida', 3),
+                                                                        ('Diferencia de presión', 3),
+                                                                        ('Temperatura', 1),
+                                                                        ('Gravedad específica', 1),
+                                                                        ('Presión de vapor', 1),
+                                                                        ('Viscosidad', 1),
+                                                                        ('Velocidad del sonido', 1)]
+              for index in range(number_of_inputs)] + ['Diámetro'] #Diámetro in inches
+SLOTS = {key: slot for slot, key in enumerate(INPUT_KEYS)}
+DISABLED_AT_START = ['Gravedad específica 0', 'Presión de vapor 0', 'Viscosidad 0', 'Velocidad del sonido 0'] #Filled from the fluid until 'Otro' is chosen
+
+
+class SessionValues:
+
+    __slots__ = ('values', 'disabled')
+
+    def __init__(self):
+        self.values = array('d', [NAN] * len(INPUT_KEYS)) #Base units, NaN when empty
+        self.disabled = 0 #Bit SLOTS[key] is set when the input is disabled
+        for key in DISABLED_AT_START:
+            self.set_disabled(key, True)
+
+    def __repr__(self):
+        given = {key: self.values[slot] for key, slot in SLOTS.items() if self.values[slot] == self.values[slot]}
+        return(f'SessionValues({given}, disabled = {[key for key in SLOTS if self.is_disabled(key)]})')
+
+    def get(self, key): #None for empty inputs and keys that are not tracked, like outputs
+        slot = SLOTS.get(key)
+        if slot is None:
+            return(None)
+        value = self.values[slot]
+        if value != value:
+            return(None)
+        return(value)
+
+    def set(self, key, value):
+        slot = SLOTS.get(key)
+        if slot is None: #Outputs are recomputed from the sizing on every run, nothing to remember
+            return()
+        self.values[slot] = NAN if value is None else value
+
+    def is_disabled(self, key):
+        slot = SLOTS.get(key)
+        return(slot is not None and bool(self.disabled >> slot & 1))
+
+    def set_disabled(self, key, disabled):
+        bit = 1 << SLOTS[key]
+        if disabled:
+            self.disabled |= bit
+        else:
+            self.disabled &= ~bit
+
+
+def get_session_values() -> SessionValues: #Built on first use in each session
+    values = st.session_state.get(SESSION_VALUES_KEY)
+    if values is None:
+        values = st.session_state[SESSION_VALUES_KEY] = SessionValues()
+    return(values)
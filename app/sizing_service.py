@@ -0,0 +1,296 @@
+
+#encoding: utf-8
+
+#Headless JSON service over the sizing core, for programs that cannot go through the Streamlit page.
+#Usage: python app/sizing_service.py [--host 127.0.0.1] [--port 8765] [--batch-window-ms 2]
+#   GET  /health, /catalog/valves, /catalog/valves/<name>, /catalog/fluids
+#   POST /size  {"valve": "PA", "diameter": 4, "flow": 2200, "in_pressure": 50, "pressure_differential": 10, "fluid": "Agua", "temperature": 20}
+#   POST /rate  {"valve": "PA", "diameter": 4, "opening": 60, "pressure_differential": 10, "fluid": "Agua", "temperature": 20}
+#Values in the base units of core.constants.INPUT_UNITS unless "units" says otherwise, e.g. "units": {"flow": "m³/h", "in_pressure": "bar"}.
+#Sizing requests for the same series and diameter arriving within the batch window are sized together by one DimensionamientoBatch.
+
+import argparse
+import asyncio
+import logging
+import math
+import orjson
+import numpy as np
+from core.constants import INPUT_UNITS, OUTPUT_COLUMNS, FLAG_COLUMNS
+from core.catalog import load_valves, load_fluids
+from core.sizing import DimensionamientoBatch, get_fluid_properties, get_dimensionable_and_available_diameters
+from core.units import get_scale_and_offset
+
+DEFAULT_PORT = 8765
+DEFAULT_BATCH_WINDOW = 0.002 #Seconds a sizing request waits for others of the same series and diameter
+MAX_BODY_SIZE = 1 << 20
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+logger = logging.getLogger(__name__)
+
+
+class RequestError(Exception): #Becomes a JSON error response with this status
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def get_number(body: dict, name, units: dict, required = True): #Float in base units, NaN if missing and not required
+    value = body.get(name)
+    if value is None:
+        if required:
+            raise RequestError(400, f'missing {name}')
+        return(float('nan'))
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RequestError(400, f'{name} must be a number')
+    unit = units.get(name)
+    if unit is None or unit == INPUT_UNITS.get(name):
+        return(float(value))
+    try:
+        scale, offset = get_scale_and_offset(unit, INPUT_UNITS[name])
+    except Exception: #pint raises several kinds for unknown or incompatible units
+        raise RequestError(400, f'unknown unit {unit} for {name}')
+    return(value * scale + offset)
+
+def get_name(body: dict, name): #None if missing
+    value = body.get(name)
+    if value is not None and not isinstance(value, str):
+        raise RequestError(400, f'{name} must be a string')
+    return(value)
+
+def get_flag(body: dict, name): #False if missing, only a JSON boolean otherwise
+    value = body.get(name, False)
+    if not isinstance(value, bool):
+        raise RequestError(400, f'{name} must be true or false')
+    return(value)
+
+def get_valve_and_diameter(body: dict):
+    valves = load_valves()
+    if get_name(body, 'valve') not in valves:
+        raise RequestError(404, f'unknown valve {body.get("valve")}')
+    valve = valves[body['valve']]
+    diameter = body.get('diameter')
+    if isinstance(diameter, bool) or not isinstance(diameter, (int, float)) or float(diameter) not in valve.diameter_rows:
+        raise RequestError(404, f'no Cv data for {valve.name} {diameter} in')
+    return(valve, float(diameter))
+
+def get_fluid_values(body: dict, units: dict): #Explicit values win over the fluid's, like batch_sizing
+    values = {name: get_number(body, name, units, required = False) for name in ['specific_gravity', 'vapor_pressure', 'viscosity']}
+    fluid_name = get_name(body, 'fluid')
+    if fluid_name is not None:
+        fluids = load_fluids()
+        if fluid_name not in fluids:
+            raise RequestError(404, f'unknown fluid {fluid_name}')
+        properties = get_fluid_properties(fluids[fluid_name], [get_number(body, 'temperature', units)])
+        for name, value in values.items():
+            if math.isnan(value):
+                values[name] = float(properties[name][0])
+    if math.isnan(values['specific_gravity']):
+        raise RequestError(400, 'missing specific_gravity, or fluid and temperature')
+    if not values['specific_gravity'] > 0:
+        raise RequestError(400, f'specific_gravity must be positive, got {values["specific_gravity"]:g}')
+    return(values)
+
+def get_pressure_differential(body: dict, units: dict):
+    if body.get('pressure_differential') is not None:
+        return(get_number(body, 'pressure_differential', units))
+    return(get_number(body, 'in_pressure', units) - get_number(body, 'out_pressure', units))
+
+def get_units(body: dict):
+    units = body.get('units') or {}
+    if not isinstance(units, dict):
+        raise RequestError(400, 'units must be an object')
+    if 'out_pressure' not in units and 'in_pressure' in units:
+        units = dict(units, out_pressure = units['in_pressure'])
+    return(units)
+
+
+class SizingCoalescer: #Sizes every point waiting for the same (series, diameter) in one vectorized call
+
+    def __init__(self, batch_window = DEFAULT_BATCH_WINDOW):
+        self.batch_window = batch_window
+        self.pending: dict[tuple, list] = {}
+        self.batches = 0
+        self.points = 0
+
+    async def size(self, valve, diameter, point: dict):
+        key = (valve.name, diameter)
+        future = asyncio.get_running_loop().create_future()
+        waiting = self.pending.get(key)
+        if waiting is None:
+            waiting = self.pending[key] = []
+            asyncio.get_running_loop().call_later(self.batch_window, self.flush, key, valve)
+        waiting.append((point, future))
+        return(await future)
+
+    def flush(self, key, valve):
+        waiting = self.pending.pop(key)
+        _, diameter = key
+        columns = {name: np.array([point[name] for point, _ in waiting]) for name in waiting[0][0]}
+        try:
+            dimens = DimensionamientoBatch(valve, diameter, columns['flow'], columns['in_pressure'], columns['pressure_differential'],
+                                           columns['specific_gravity'], columns['vapor_pressure'], columns['viscosity'])
+            dimens.calculate_outputs()
+            dimens.set_flags()
+        except Exception as error:
+            for _, future in waiting:
+                future.set_exception(error)
+            return()
+        self.batches += 1
+        self.points += len(waiting)
+
+        outputs = {column: getattr(dimens, column).tolist() for column in OUTPUT_COLUMNS + FLAG_COLUMNS}
+        for index, (_, future) in enumerate(waiting):
+            if not future.cancelled(): #Client went away
+                future.set_result({column: values[index] for column, values in outputs.items()})
+
+
+class SizingService:
+
+    def __init__(self, batch_window = DEFAULT_BATCH_WINDOW):
+        self.coalescer = SizingCoalescer(batch_window)
+        self.routes = {('GET', '/health'): self.health,
+                       ('GET', '/catalog/valves'): self.list_valves,
+                       ('GET', '/catalog/fluids'): self.list_fluids,
+                       ('POST', '/size'): self.size,
+                       ('POST', '/rate'): self.rate}
+
+    async def health(self, body):
+        return({'status': 'ok', 'batches': self.coalescer.batches, 'points': self.coalescer.points})
+
+    async def list_valves(self, body):
+        return({'valves': [{'name': summary.name, 'style': summary.style, 'max_opening': summary.max_opening}
+                           for summary in load_valves().summaries.values()]})
+
+    async def describe_valve(self, valve_name):
+        valves = load_valves()
+        if valve_name not in valves:
+            raise RequestError(404, f'unknown valve {valve_name}')
+        valve = valves[valve_name]
+        return({'name': valve.name,
+                'style': valve.style,
+                'diameters': get_dimensionable_and_available_diameters(valve),
+                'max_opening': valve.max_opening,
+                'max_velocity_without_erosion': valve.max_velocity_without_erosion,
+                'openings': valve.openings.tolist(),
+                'Cv': {f'{diameter:g}': valve.Cvs_at(diameter).tolist() for diameter in valve.diameter_rows}})
+
+    async def list_fluids(self, body):
+        return({'fluids': [fluid_name for fluid_name in load_fluids() if fluid_name != 'Otro']})
+
+    async def size(self, body):
+        valve, diameter = get_valve_and_diameter(body)
+        units = get_units(body)
+        point = {'flow': get_number(body, 'flow', units),
+                 'in_pressure': get_number(body, 'in_pressure', units),
+                 'pressure_differential': get_pressure_differential(body, units)}
+        point.update(get_fluid_values(body, units))
+        get_flag(body, 'iterate_Reynolds') #Still accepted from older clients, one lookup already gives the converged Cv
+        return(await self.coalescer.size(valve, diameter, point))
+
+    async def rate(self, body): #Flow through the valve at a given opening, turbulent and without viscosity correction like the plot
+        valve, diameter = get_valve_and_diameter(body)
+        units = get_units(body)
+        opening = get_number(body, 'opening', {}) #Always %
+        if not valve.openings[0] <= opening <= valve.max_opening:
+            raise RequestError(400, f'opening must be between {valve.openings[0]:g} and {valve.max_opening:g}')
+        pressure_differential = get_pressure_differential(body, units)
+        specific_gravity = get_fluid_values(body, units)['specific_gravity']
+        Cv = float(np.interp(opening, valve.openings, valve.Cvs_at(diameter)))
+        return({'Cv': Cv, 'flow': Cv * (pressure_differential / specific_gravity)**(1/2) if pressure_differential >= 0 else None})
+
+    async def dispatch(self, method, path, body):
+        if path.startswith('/catalog/valves/') and method == 'GET':
+            return(await self.describe_valve(path[len('/catalog/valves/'):]))
+        route = self.routes.get((method, path))
+        if route is None:
+            if any(route_path == path for _, route_path in self.routes):
+                raise RequestError(405, f'{method} not allowed on {path}')
+            raise RequestError(404, f'no endpoint {path}')
+        return(await route(body))
+
+    async def handle_request(self, method, path, raw_body): #(status, JSON bytes)
+        try:
+            body = orjson.loads(raw_body) if raw_body else {}
+            if not isinstance(body, dict):
+                raise RequestError(400, 'body must be a JSON object')
+            return(200, orjson.dumps(await self.dispatch(method, path, body)))
+        except orjson.JSONDecodeError as error:
+            return(400, orjson.dumps({'error': f'invalid JSON: {error}'}))
+        except RequestError as error:
+            return(error.status, orjson.dumps({'error': str(error)}))
+        except Exception:
+            logger.exception('%s %s failed', method, path)
+            return(500, orjson.dumps({'error': 'internal error'}))
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter): #HTTP/1.1 with keep-alive, one request at a time
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = request_line.split(' ')
+                except ValueError:
+                    break
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get('content-length') or '0'
+                if not (length.isascii() and length.isdigit()): #Without a valid length the next request cannot be found, so the connection is closed
+                    status, response = 400, orjson.dumps({'error': 'invalid Content-Length'})
+                    keep_alive = False
+                elif int(length) > MAX_BODY_SIZE:
+                    status, response = 413, orjson.dumps({'error': 'body too large'})
+                    keep_alive = False
+                else:
+                    length = int(length)
+                    raw_body = await reader.readexactly(length) if length else b''
+                    status, response = await self.handle_request(method, target.split('?')[0], raw_body)
+                    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                writer.write(f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                             f'Content-Type: application/json\r\n'
+                             f'Content-Length: {len(response)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        load_valves() #Catalog index and fluids are read before the first request
+        load_fluids()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info('Listening on %s', ', '.join(str(socket.getsockname()) for socket in server.sockets))
+        async with server:
+            await server.serve_forever()
+
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(description = 'Serves sizing, rating and catalog queries as JSON over HTTP.')
+    parser.add_argument('--host', default = '127.0.0.1', help = 'address to listen on, 0.0.0.0 for every interface')
+    parser.add_argument('--port', type = int, default = DEFAULT_PORT)
+    parser.add_argument('--batch-window-ms', type = float, default = DEFAULT_BATCH_WINDOW * 1000,
+                        help = 'how long a sizing request waits for others of the same series and diameter, 0 sizes each on the next loop turn')
+    return(parser.parse_args(arguments))
+
+def main(arguments = None):
+    arguments = parse_arguments(arguments)
+    logging.basicConfig(level = logging.INFO, format = '%(asctime)s %(levelname)s %(message)s')
+    service = SizingService(arguments.batch_window_ms / 1000)
+    try:
+        asyncio.run(service.serve(arguments.host, arguments.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+
+#encoding: utf-8
+
+#Cold start of a replica, measured in fresh interpreters: time of each import and cache initialization the first page
+#needs, the first and second page runs, and which packages the import time goes to (python -X importtime).
+#Usage: python app/startup_profile.py [--repeat 5] [--top 15] [--no-render] [--output startup.json]
+#Build data/catalog.npz and data/static_assets.json first (python -m core.catalog_cache, python -m core.static_assets)
+#to measure what a replica built from the image sees; without them the first start pays for building them.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+APP_PATH = Path(__file__).resolve().parent
+STARTUP_PROFILE_FORMAT_VERSION = 1
+PROBE_FLAG = '--probe'
+
+#Libraries, then the caches, so each app module import below only measures the import itself. Modules in the order frontend.py reaches them
+LIBRARIES = ['streamlit', 'numpy', 'core']
+CACHE_STAGES = [('static assets', 'core.static_assets', 'load_static_assets'),
+                ('unit conversion table', 'core.units', 'get_conversion_table'),
+                ('catalog', 'core.catalog', 'load_catalog_arrays'),
+                ('valves', 'core.catalog', 'load_valves'),
+                ('fluids', 'core.catalog', 'load_fluids')]
+MODULES = ['constants', 'load_data', 'plots', 'session_values', 'callbacks', 'backend', 'user_inputs']
+HEAVY_MODULES = ['pint', 'PIL', 'pandas', 'plotly', 'scipy'] #Reported as loaded or not at the end of the start
+
+
+def probe(render): #Runs in the fresh interpreter, prints the stage timings as JSON on stdout
+    from importlib import import_module
+
+    stages = []
+    def timed(name, function):
+        start = time.perf_counter()
+        result = function()
+        stages.append((name, time.perf_counter() - start))
+        return(result)
+
+    for module_name in LIBRARIES:
+        timed(f'import {module_name}', lambda: import_module(module_name))
+    for name, module_name, function_name in CACHE_STAGES:
+        module = timed(f'import {module_name}', lambda: import_module(module_name))
+        timed(name, getattr(module, function_name))
+    for module_name in MODULES:
+        timed(f'import {module_name}', lambda: import_module(module_name))
+    if render: #AppTest runs the script like a server session would, minus the websocket
+        from streamlit.testing.v1 import AppTest
+
+        app = AppTest.from_file(str(APP_PATH / 'frontend.py'), default_timeout = 120)
+        timed('first page run', app.run)
+        timed('second page run', app.run)
+    print(json.dumps({'stages': stages,
+                      'loaded': {module_name: module_name in sys.modules for module_name in HEAVY_MODULES}}))
+
+def parse_import_times(stderr): #{module: (self seconds, cumulative seconds)} from the -X importtime lines
+    import_times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative_time, module_name = line[len('import time:'):].split('|')
+        import_times[module_name.strip()] = (int(self_time) * 1e-6, int(cumulative_time) * 1e-6)
+    return(import_times)
+
+def run_cold_start(render): #One fresh interpreter, as a new replica starts
+    command = [sys.executable, '-X', 'importtime', str(Path(__file__).resolve()), PROBE_FLAG]
+    if not render:
+        command.append('--no-render')
+    environment = dict(os.environ, PYTHONPATH = str(APP_PATH), STREAMLIT_BROWSER_GATHER_USAGE_STATS = 'false')
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd = APP_PATH, env = environment, capture_output = True, text = True)
+    wall_time = time.perf_counter() - start
+    if completed.returncode != 0:
+        sys.exit(f'Cold start failed:\n{completed.stderr[-4000:]}')
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['wall_time'] = wall_time
+    result['import_times'] = parse_import_times(completed.stderr)
+    return(result)
+
+def get_package_times(import_times): #Self time summed per top-level package
+    packages = {}
+    for module_name, (self_time, _) in import_times.items():
+        package = module_name.split('.')[0]
+        packages[package] = packages.get(package, 0.0) + self_time
+    return(packages)
+
+def profile_startup(repeat = 5, render = True, top = 15):
+    from core.constants import CATALOG_CACHE_PATH, STATIC_ASSETS_PATH
+
+    prebuilt = {'compiled_catalog': CATALOG_CACHE_PATH.exists(), 'static_assets': STATIC_ASSETS_PATH.exists()} #Before the first start builds them
+    runs = [run_cold_start(render) for _ in range(repeat)]
+
+    stage_names = [name for name, _ in runs[0]['stages']]
+    stages = {name: statistics.median(dict(run['stages'])[name] for run in runs) for name in stage_names}
+    packages = {}
+    for run in runs:
+        for package, seconds in get_package_times(run['import_times']).items():
+            packages.setdefault(package, []).append(seconds)
+    packages = {package: statistics.median(seconds + [0.0] * (repeat - len(seconds))) for package, seconds in packages.items()}
+    modules = {}
+    for run in runs:
+        for module_name, (self_time, _) in run['import_times'].items():
+            modules.setdefault(module_name, []).append(self_time)
+    modules = {module_name: statistics.median(seconds) for module_name, seconds in modules.items()}
+
+    return({'format_version': STARTUP_PROFILE_FORMAT_VERSION,
+            'repeat': repeat,
+            'python': sys.version.split()[0],
+            'compiled_catalog': prebuilt['compiled_catalog'],
+            'static_assets': prebuilt['static_assets'],
+            'wall_time': statistics.median(run['wall_time'] for run in runs),
+            'stages': stages,
+            'import_time_by_package': dict(sorted(packages.items(), key = lambda item: -item[1])[:top]),
+            'import_time_by_module': dict(sorted(modules.items(), key = lambda item: -item[1])[:top]),
+            'loaded': runs[-1]['loaded']})
+
+def format_report(report):
+    lines = [f'Cold start, median of {report["repeat"]}: {report["wall_time"] * 1e3:.0f} ms wall time of the interpreter '
+             f'(compiled catalog {"present" if report["compiled_catalog"] else "missing"}, static assets {"present" if report["static_assets"] else "missing"})']
+    for name, seconds in report['stages'].items():
+        lines.append(f'  {name:<36}{seconds * 1e3:>9.1f} ms')
+    lines.append('Import time by package (self time):')
+    for package, seconds in report['import_time_by_package'].items():
+        lines.append(f'  {package:<36}{seconds * 1e3:>9.1f} ms')
+    lines.append('Slowest modules (self time):')
+    for module_name, seconds in report['import_time_by_module'].items():
+        lines.append(f'  {module_name:<36}{seconds * 1e3:>9.1f} ms')
+    lines.append('Loaded after start: ' + ', '.join(f'{module_name} {"yes" if loaded else "no"}' for module_name, loaded in report['loaded'].items()))
+    return('\n'.join(lines))
+
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(description = 'Breaks down the cold start of the app into imports, cache initializations and the first page run.')
+    parser.add_argument('--repeat', type = int, default = 5, help = 'fresh interpreters to start, the report shows medians')
+    parser.add_argument('--top', type = int, default = 15, help = 'packages and modules listed by import time')
+    parser.add_argument('--no-render', action = 'store_true', help = 'skip the page runs, imports and caches only')
+    parser.add_argument('--output', help = 'JSON file to write the report to')
+    parser.add_argument(PROBE_FLAG, action = 'store_true', help = argparse.SUPPRESS)
+    return(parser.parse_args(arguments))
+
+def main(arguments = None):
+    arguments = parse_arguments(arguments)
+    if arguments.probe:
+        probe(render = not arguments.no_render)
+        return()
+    report = profile_startup(arguments.repeat, not arguments.no_render, arguments.top)
+    print(format_report(report))
+    if arguments.output:
+        Path(arguments.output).write_text(json.dumps(report, indent = 2) + '\n', encoding = 'utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+
+#encoding: utf-8
+
+#Monte Carlo uncertainty of one sizing: percentiles of opening, velocity and allowable ΔP, and the probability of each warning.
+#Usage: python app/uncertainty_analysis.py PA 4 Agua --flow normal:2200,100 --in-pressure 50 --out-pressure uniform:38,42 --temperature triangular:15,20,30
+#Distributions: a plain number, normal:mean,std, uniform:low,high or triangular:low,mode,high
+
+import argparse
+import json
+import sys
+import time
+from core.catalog import load_valves, load_fluids
+from core.units import get_scale_and_offset, from_base_unit
+from core.uncertainty import InputDistribution, run_monte_carlo, DEFAULT_SAMPLES, DEFAULT_CHUNK_SIZE, DEFAULT_PERCENTILES
+from core.constants import INPUT_UNITS
+
+
+def to_base_units(distributions: dict, units: dict):
+    converted = {}
+    for name, distribution in distributions.items():
+        scale, offset = get_scale_and_offset(units[name], INPUT_UNITS[name])
+        converted[name] = distribution.converted(scale, offset)
+    return(converted)
+
+def format_report(report, units: dict): #Plain text table, in the units the inputs were given in
+    output_units = {'opening': ('Apertura', '%'), 'velocity': ('Velocidad', 'ft/s'), 'allowable_pressure_differential': ('Presión', units['in_pressure'])}
+    lines = [f'{report["samples"]} samples, {report["invalid_probability"]:.2%} with flow <= 0 or P2 >= P1']
+    for output, percentiles in report['percentiles'].items():
+        quantity_name, unit = output_units[output]
+        values = ', '.join(f'p{percent:g} {from_base_unit(value, quantity_name, unit):.4g}' for percent, value in percentiles.items())
+        lines.append(f'{output} ({unit}): {values}, undefined {report["undefined_probability"][output]:.2%}')
+    for flag, probability in report['flag_probabilities'].items():
+        lines.append(f'P({flag}) = {probability:.4%}')
+    return('\n'.join(lines))
+
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(description = 'Samples uncertain process data and reports percentiles of the sizing outputs and the probability of each warning.')
+    parser.add_argument('valve', help = 'valve series, e.g. PA')
+    parser.add_argument('diameter', type = float, help = 'diameter in inches')
+    parser.add_argument('fluid', help = 'fluid name, its properties follow the sampled temperature')
+    parser.add_argument('--flow', type = InputDistribution.from_string, required = True)
+    parser.add_argument('--in-pressure', type = InputDistribution.from_string, required = True)
+    parser.add_argument('--out-pressure', type = InputDistribution.from_string, required = True)
+    parser.add_argument('--temperature', type = InputDistribution.from_string, required = True)
+    parser.add_argument('--flow-unit', default = INPUT_UNITS['flow'], help = 'unit of the flow distribution, e.g. m³/h')
+    parser.add_argument('--pressure-unit', default = INPUT_UNITS['in_pressure'], help = 'unit of the pressure distributions, e.g. bar')
+    parser.add_argument('--temperature-unit', default = INPUT_UNITS['temperature'], help = 'unit of the temperature distribution, e.g. °F')
+    parser.add_argument('--samples', type = int, default = DEFAULT_SAMPLES)
+    parser.add_argument('--chunk-size', type = int, default = DEFAULT_CHUNK_SIZE, help = 'samples sized at once, bounds memory')
+    parser.add_argument('--percentiles', type = float, nargs = '+', default = DEFAULT_PERCENTILES)
+    parser.add_argument('--seed', type = int, help = 'random seed, for reproducible reports')
+    parser.add_argument('--json', action = 'store_true', help = 'print the report as JSON, base units')
+    return(parser.parse_args(arguments))
+
+def main(arguments = None):
+    arguments = parse_arguments(arguments)
+    valves, fluids = load_valves(), load_fluids()
+    if arguments.valve not in valves:
+        sys.exit(f'Unknown valve {arguments.valve}, available: {", ".join(valves)}')
+    if arguments.fluid not in fluids:
+        sys.exit(f'Unknown fluid {arguments.fluid}, available: {", ".join(fluids)}')
+    valve = valves[arguments.valve]
+    fluid = fluids[arguments.fluid]
+    if arguments.diameter not in valve.diameter_rows:
+        sys.exit(f'No Cv data for {arguments.valve} {arguments.diameter:g} in, available: {", ".join(f"{diameter:g}" for diameter in valve.diameter_rows)} in')
+    units = {'flow': arguments.flow_unit,
+             'in_pressure': arguments.pressure_unit,
+             'out_pressure': arguments.pressure_unit,
+             'temperature': arguments.temperature_unit}
+    distributions = to_base_units({'flow': arguments.flow,
+                                   'in_pressure': arguments.in_pressure,
+                                   'out_pressure': arguments.out_pressure,
+                                   'temperature': arguments.temperature}, units)
+
+    start = time.perf_counter()
+    report = run_monte_carlo(valve, arguments.diameter, fluid, distributions, arguments.samples, arguments.chunk_size,
+                             arguments.percentiles, arguments.seed)
+    if arguments.json:
+        print(json.dumps(report, indent = 2))
+    else:
+        print(format_report(report, units))
+    print(f'{time.perf_counter() - start:.2f} s', file = sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,12 +2,12 @@
 #encoding: utf-8
 
 import streamlit as st
-import pint
-from unit_registry import ureg
-from constants import UNITS_AS_STRING, BASE_UNITS
+from core.units import from_base_unit
+from constants import UNITS_AS_STRING
 from load_data import VALVES, FLUIDS
 from backend import in_base_unit, get_dimensionable_and_available_diameters
 from callbacks import update_number_inputs, update_fluid_values_boxes, update_diameter_dropdown_value
+from session_values import get_session_values
 
 
 def generate_valve_and_fluid_dropdowns(valves: dict, fluids: dict):
@@ -54,7 +54,7 @@ def generate_unit_input(quantity_name,
     is_disabled = False
     if len(available_units) == 1:
         is_disabled = True
-    kwargs = {'unit_key': unit_key, 'associated_keys': associated_number_input_keys}
+    kwargs = {'quantity_name': quantity_name, 'unit_key': unit_key, 'associated_keys': associated_number_input_keys}
 
     st.selectbox(label = unit_key, 
                  key = unit_key, 
@@ -76,25 +76,18 @@ def generate_number_input(quantity_name,
                           callback = lambda: None, 
                           kwargs = None):
 
-    current_unit = ureg(st.session_state[unit_key])
-    base_unit = ureg(BASE_UNITS[quantity_name])
+    current_unit = st.session_state[unit_key]
 
     min_value, max_value = inputs_range
     if min_value is not None:
-        try:
-            min_value = float(((min_value * base_unit).to(current_unit)).magnitude) #esto es lo que falla con psia
-        except pint.errors.OffsetUnitCalculusError:
-            min_value = float((pint.Quantity(min_value, base_unit).to(current_unit)).magnitude)
+        min_value = float(from_base_unit(min_value, quantity_name, current_unit)) #Offset units (°F) work too
     if max_value is not None:
-        try:
-            max_value = float(((max_value * base_unit).to(current_unit)).magnitude)
-        except pint.errors.OffsetUnitCalculusError:
-            max_value = float((pint.Quantity(max_value, base_unit).to(current_unit)).magnitude)
+        max_value = float(from_base_unit(max_value, quantity_name, current_unit))
 
     if disabled:
         is_disabled = True
     else:
-        is_disabled = st.session_state.get(f'{key} is disabled', False)
+        is_disabled = get_session_values().is_disabled(key)
 
     st.number_input(label = key, 
                     key = key, 
@@ -110,7 +103,7 @@ def generate_number_input(quantity_name,
                     label_visibility = 'collapsed')
 
     current_quantity_in_base_unit = in_base_unit(quantity_name, key, unit_key)
-    st.session_state['old_values'][key] = current_quantity_in_base_unit
+    get_session_values().set(key, current_quantity_in_base_unit)
     return(current_quantity_in_base_unit)
 
 def generate_multiple_inputs(written_name, 
@@ -196,11 +189,10 @@ def generate_diameter_input_line(valve): #Quick patch to use it only on diameter
                                 accept_new_options = False, 
                                 label_visibility = 'collapsed')
         
-        st.session_state['old_values']['Diámetro'] = diameter
-        
         if diameter is not None:
             if st.session_state['Diámetro unidad'] == 'mm':
                 diameter = float(diameter/25)
+        get_session_values().set('Diámetro', diameter) #Inches
     
     return(diameter)
 